@@ -0,0 +1,158 @@
+# aggregates.py
+#
+# Summary tables for the Dashboard page, kept up to date as submissions are
+# saved: db.save_submission_db() calls record() and save_submissions_bulk()
+# record_frame() in the same transaction as their INSERT, so the totals
+# always match the table. The dashboard reads only these tables, whose size
+# grows with the number of days rather than the number of submissions.
+#
+#   agg_daily      day -> total, positive, probability sum/count
+#   agg_histogram  (feature, day, bucket, prediction) -> count
+#
+# Days come from the patient ID prefix (YYYYMMDD), like the View Database
+# date filter. After changing HISTOGRAM_BUCKETS, rebuild from the table:
+#
+#   python aggregates.py --rebuild
+
+import argparse
+from collections import Counter
+
+from db import get_conn, init_db, transaction
+
+# Histogram bucket width per feature; a value v falls in bucket floor(v / w) * w.
+HISTOGRAM_BUCKETS = {'age': 5, 'trestbps': 10, 'chol': 25, 'thalach': 10}
+
+# ─── 1) Writing ───────────────────────────────────────────────────────────────────
+def _bucket(value: float, width: float) -> float:
+    return float(value // width * width)
+
+def _upsert(conn, daily_rows, hist_rows):
+    """Adds (day, total, positive, prob_sum, prob_count) and (feature, day,
+    bucket, prediction, count) deltas to the tables."""
+    conn.executemany("""
+        INSERT INTO agg_daily (day, total, positive, prob_sum, prob_count)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (day) DO UPDATE SET
+            total = total + excluded.total, positive = positive + excluded.positive,
+            prob_sum = prob_sum + excluded.prob_sum,
+            prob_count = prob_count + excluded.prob_count
+    """, daily_rows)
+    conn.executemany("""
+        INSERT INTO agg_histogram (feature, day, bucket, prediction, count)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (feature, day, bucket, prediction) DO UPDATE SET
+            count = count + excluded.count
+    """, hist_rows)
+
+def record(conn, rows):
+    """
+    Adds a few submissions to the aggregates on `conn` (inside the caller's
+    transaction). `rows` are (id, prediction, probability, then the
+    HISTOGRAM_BUCKETS features in order) tuples. Use record_frame() for
+    bulk chunks.
+    """
+    daily = {}
+    hist = Counter()
+    for pid, pred, prob, *features in rows:
+        day = pid[:8]
+        totals = daily.setdefault(day, [0, 0, 0.0, 0])
+        totals[0] += 1
+        totals[1] += pred
+        if prob is not None and prob == prob:  # NaN: not scored
+            totals[2] += prob
+            totals[3] += 1
+        for (feature, width), value in zip(HISTOGRAM_BUCKETS.items(), features):
+            if value is not None and value == value:
+                hist[feature, day, _bucket(value, width), pred] += 1
+    _upsert(conn, [(day, *totals) for day, totals in daily.items()],
+            [(*key, n) for key, n in hist.items()])
+
+def record_frame(conn, frame):
+    """
+    record() for a DataFrame (columns id, prediction, probability and the
+    HISTOGRAM_BUCKETS features), summed with vectorized group-bys so a bulk
+    chunk costs a few milliseconds per thousand rows.
+    """
+    frame = frame.assign(day=frame['id'].str[:8])
+    daily = frame.groupby('day').agg(
+        total=('prediction', 'size'), positive=('prediction', 'sum'),
+        prob_sum=('probability', 'sum'), prob_count=('probability', 'count')
+    )
+    hist_rows = []
+    for feature, width in HISTOGRAM_BUCKETS.items():
+        counts = frame.groupby(
+            ['day', frame[feature] // width * width, 'prediction']
+        ).size()  # NaN values drop out of the group keys
+        hist_rows += [(feature, day, float(bucket), int(pred), int(n))
+                      for (day, bucket, pred), n in counts.items()]
+    _upsert(conn, [(day, int(t), int(p), float(s), int(c))
+                   for day, t, p, s, c in daily.itertuples()], hist_rows)
+
+def rebuild(chunk_rows: int = 50_000):
+    """
+    Recomputes every aggregate from the submissions table, through
+    record_frame() so rebuilt and incremental totals match. Joins the
+    caller's transaction if there is one (as in the v3 migration).
+    """
+    import pandas as pd
+
+    numeric = ['probability', *HISTOGRAM_BUCKETS]  # all-NULL chunks read as object
+    with transaction(immediate=True) as conn:
+        conn.execute("DELETE FROM agg_daily")
+        conn.execute("DELETE FROM agg_histogram")
+        for chunk in pd.read_sql_query(
+            f"SELECT id, prediction, {', '.join(numeric)} FROM submissions", conn,
+            chunksize=chunk_rows
+        ):
+            record_frame(conn, chunk.astype(dict.fromkeys(numeric, 'float64')))
+
+# ─── 2) Reading ───────────────────────────────────────────────────────────────────
+def _day_range(date_from, date_to) -> tuple:
+    """WHERE clause and params for an optional date range (dates or None)."""
+    clauses, params = [], []
+    if date_from is not None:
+        clauses.append("day >= ?")
+        params.append(date_from.strftime("%Y%m%d"))
+    if date_to is not None:
+        clauses.append("day <= ?")
+        params.append(date_to.strftime("%Y%m%d"))
+    return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+def daily_summary(date_from=None, date_to=None) -> list:
+    """
+    [(day, total, positive, scored, mean probability or None)] in day order;
+    `scored` counts the submissions that have a model probability.
+    """
+    where, params = _day_range(date_from, date_to)
+    return get_conn().execute(f"""
+        SELECT day, total, positive, prob_count,
+               CASE WHEN prob_count > 0 THEN prob_sum / prob_count END
+        FROM agg_daily {where} ORDER BY day
+    """, params).fetchall()
+
+def histogram(feature: str, date_from=None, date_to=None) -> list:
+    """[(bucket lower bound, negatives, positives)] for one feature, in bucket order."""
+    if feature not in HISTOGRAM_BUCKETS:
+        raise ValueError(f"No histogram for {feature!r}; have {list(HISTOGRAM_BUCKETS)}")
+    where, params = _day_range(date_from, date_to)
+    where = f"{where} AND feature = ?" if where else "WHERE feature = ?"
+    return get_conn().execute(f"""
+        SELECT bucket, TOTAL(CASE WHEN prediction = 0 THEN count END),
+               TOTAL(CASE WHEN prediction = 1 THEN count END)
+        FROM agg_histogram {where} GROUP BY bucket ORDER BY bucket
+    """, params + [feature]).fetchall()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dashboard aggregate tables")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="recompute all aggregates from the submissions table")
+    args = parser.parse_args(argv)
+    init_db()
+    if args.rebuild:
+        rebuild()
+    days = daily_summary()
+    print(f"{len(days)} days, {sum(d[1] for d in days)} submissions, "
+          f"{sum(d[2] for d in days)} positive")
+
+if __name__ == '__main__':
+    main()
@@ -1,173 +1,23 @@
 # app.py
 
 import os
-import pickle
 import streamlit as st
 from streamlit_option_menu import option_menu
 
-import uuid
-from datetime import datetime, timedelta
-from io import BytesIO
-import sqlite3
-import pandas as pd
-import zipfile
-
-from fpdf import FPDF
-
-DB_FILE = 'submissions.db'
-
-# ─── 1) Initialize both tables (users + submissions) ──────────────────────────────
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    # Users table:
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            username TEXT PRIMARY KEY,
-            name     TEXT,
-            password TEXT
-        )
-    """)
-    # Submissions table:
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS submissions (
-            id        TEXT PRIMARY KEY,
-            age       REAL,
-            sex       REAL,
-            cp        REAL,
-            trestbps  REAL,
-            chol      REAL,
-            fbs       REAL,
-            restecg   REAL,
-            thalach   REAL,
-            exang     REAL,
-            oldpeak   REAL,
-            slope     REAL,
-            ca        REAL,
-            thal      REAL,
-            diagnosis TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-init_db()  # make sure both tables exist
-
-# ─── 2) Submission helpers ────────────────────────────────────────────────────────
-def save_submission_db(sub: dict):
-    """Insert (or replace) one row into submissions table."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT OR REPLACE INTO submissions (
-            id, age, sex, cp, trestbps, chol, fbs,
-            restecg, thalach, exang, oldpeak, slope, ca, thal, diagnosis
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        sub['id'],
-        float(sub['age']), float(sub['sex']), float(sub['cp']),
-        float(sub['trestbps']), float(sub['chol']), float(sub['fbs']),
-        float(sub['restecg']), float(sub['thalach']), float(sub['exang']),
-        float(sub['oldpeak']), float(sub['slope']), float(sub['ca']),
-        float(sub['thal']), sub['diagnosis']
-    ))
-    conn.commit()
-    conn.close()
-
-def generate_patient_id() -> str:
-    """
-    Generates a sequential ID per day, of form YYYYMMDD_NNN.
-    """
-    today = datetime.now().strftime("%Y%m%d")
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM submissions WHERE id LIKE ?", (f"{today}%",))
-    count = cursor.fetchone()[0] + 1
-    conn.close()
-    return f"{today}_{count:03d}"  # e.g. '20250601_001'
-
-# ─── 3) PDF generator (fpdf2) ──────────────────────────────────────────────────────
-def generate_pdf(submission: dict) -> BytesIO:
-    """
-    Creates a hospital‐style single-page PDF for one submission dict.
-    Returns a BytesIO buffer ready for download.
-    """
-    pdf = FPDF(format='letter')
-    pdf.add_page()
-
-    # Convert UTC → IST for timestamp
-    now_utc = datetime.utcnow()
-    now_ist = now_utc + timedelta(hours=5, minutes=30)
-
-    # HEADER
-    pdf.set_font("Helvetica", 'B', 16)
-    pdf.set_text_color(30, 30, 120)
-    pdf.cell(0, 10, "Shoolini Health Center", ln=True, align='C')
-    pdf.set_font("Helvetica", '', 12)
-    pdf.set_text_color(0, 0, 0)
-    pdf.cell(0, 8, "Heart Disease Detection Unit", ln=True, align='C')
-    pdf.cell(0, 8, 
-             "Solan-Oachghat-Kumarhatti Highway, Bajhol, Himachal Pradesh 173229, India",
-             ln=True, align='C')
-    pdf.cell(0, 8, "Phone: +917207314640 | Email: healthcenter@shooliniuniversity.com",
-             ln=True, align='C')
-    pdf.ln(10)
-
-    # TITLE + META
-    pdf.set_font("Helvetica", 'B', 14)
-    pdf.cell(0, 10, "Patient Heart Disease Report", ln=True, align='L')
-    pdf.set_font("Helvetica", '', 10)
-    pdf.cell(0, 8, f"Date: {now_ist.strftime('%Y-%m-%d %H:%M:%S')} IST", ln=True)
-    pdf.cell(0, 8, f"Patient ID: {submission['id']}", ln=True)
-    pdf.ln(8)
-
-    # PATIENT INFO
-    pdf.set_font("Helvetica", 'B', 13)
-    pdf.cell(0, 10, "Patient Information", ln=True)
-    pdf.set_font("Helvetica", '', 10)
-    fields = [
-        ("Age", submission['age']),
-        ("Sex", submission['sex']),
-        ("Chest Pain Type", submission['cp']),
-        ("Resting Blood Pressure", submission['trestbps']),
-        ("Cholesterol", submission['chol']),
-        ("Fasting Blood Sugar", submission['fbs']),
-        ("Resting ECG", submission['restecg']),
-        ("Max Heart Rate", submission['thalach']),
-        ("Exercise Induced Angina", submission['exang']),
-        ("Oldpeak", submission['oldpeak']),
-        ("Slope", submission['slope']),
-        ("CA (vessels colored)", submission['ca']),
-        ("Thal", submission['thal']),
-    ]
-    for label, value in fields:
-        pdf.cell(0, 8, f"{label}: {value}", ln=True)
-    pdf.ln(8)
-
-    # DIAGNOSIS
-    pdf.set_font("Helvetica", 'B', 13)
-    pdf.cell(0, 10, "Diagnosis", ln=True)
-    pdf.set_font("Helvetica", '', 10)
-    pdf.multi_cell(0, 8, submission['diagnosis'])
-
-    # FOOTER
-    pdf.set_y(-30)
-    pdf.set_font("Helvetica", 'I', 9)
-    pdf.set_text_color(100, 100, 100)
-    pdf.cell(0, 8, 
-        "This is a computer-generated report. For critical interpretation, consult a certified cardiologist.",
-        ln=True, align='C'
-    )
-
-    buf = BytesIO()
-    pdf.output(buf)
-    buf.seek(0)
-    return buf
+# Heavy dependencies (pandas, numpy, fpdf, the model) are imported inside the
+# page branches that use them, so Login/Signup/Forgot Password start fast
+# (benchmarks/startup.py measures each route's imports).
+from resources import (
+    download_link, ensure_db, ensure_job_worker, ensure_metrics, get_model, get_result_cache
+)
+from users import session_user
 
-# ─── 4) Load ML model ────────────────────────────────────────────────────────────
-heart_disease_model = pickle.load(open('heart_disease_model.sav', 'rb'))
+# ─── 1) Make sure all tables exist (once per process) ─────────────────────────────
+ensure_db()
+ensure_metrics()  # Prometheus text on 127.0.0.1:$HDD_METRICS_PORT/metrics
+ensure_job_worker()  # resumes interrupted bulk jobs right after a restart
 
-# ─── 5) Streamlit page config & sidebar menu ─────────────────────────────────────
+# ─── 2) Streamlit page config & sidebar menu ─────────────────────────────────────
 st.set_page_config(
     page_title="Health Assistant",
     layout="wide",
@@ -184,19 +34,25 @@ with st.sidebar:
             'Heart Disease Detection',
             'Bulk Reports',
             'View Database',
+            'Dashboard',
         ],
         menu_icon='hospital-fill',
-        icons=['key', 'person-add', 'key', 'heart', 'cloud-download', 'database'],
+        icons=['key', 'person-add', 'key', 'heart', 'cloud-download', 'database',
+               'bar-chart'],
         default_index=0
     )
 
-# ─── 6) Auto-redirect if already logged_in and trying to hit Login/Signup/Forgot ──
+# ─── 3) Auto-redirect if already logged_in and trying to hit Login/Signup/Forgot ──
 if st.session_state.get('logged_in', False):
     # If user is already logged in and clicked on any of these, send them to detection:
     if selected in ("Login", "Signup", "Forgot Password"):
         selected = "Heart Disease Detection"
+    # The user's profile is loaded once per session (see users.session_user)
+    user = session_user()
+    if user is not None:
+        st.sidebar.caption(f"👤 Signed in as Dr. {user.name}")
 
-# ─── 7) ROUTING ───────────────────────────────────────────────────────────────────
+# ─── 4) ROUTING ───────────────────────────────────────────────────────────────────
 if selected == "Login":
     import login
     login.login_page()
@@ -212,10 +68,16 @@ elif selected == "Forgot Password":
 elif selected == "Heart Disease Detection":
     # Show the detection page only if logged_in
     if st.session_state.get('logged_in', False):
+        from hdd import assess
+        from reports import generate_pdf, risk_text
+        from db import generate_patient_id
+
         st.title('Heart Disease Detection using DL')
 
-        # Generate a new patient ID
-        patient_id = generate_patient_id()
+        # Reserve a patient ID once per form, not on every rerun
+        if 'patient_id' not in st.session_state:
+            st.session_state.patient_id = generate_patient_id()
+        patient_id = st.session_state.patient_id
         st.markdown(f"**Patient ID:** `{patient_id}`")
 
         # Input fields (unique key for each)
@@ -238,41 +100,25 @@ elif selected == "Heart Disease Detection":
                          )
 
         if st.button('Heart Disease Test Result'):
-            # Convert inputs to float; if any fail, show error
+            # Score, build & save the submission (see hdd.assess); re-scored
+            # patients (same features, same model) come from the result cache
+            result_cache = get_result_cache()
             try:
-                inputs = [float(x) for x in [age, sex, cp, trestbps, chol, fbs,
-                                             restecg, thalach, exang, oldpeak,
-                                             slope, ca, thal]]
-            except Exception:
+                submission = assess(
+                    get_model(),
+                    [age, sex, cp, trestbps, chol, fbs, restecg, thalach,
+                     exang, oldpeak, slope, ca, thal],
+                    patient_id=patient_id,
+                    created_by=st.session_state.get('username'),
+                    cache=result_cache
+                )
+            except ValueError:
                 st.error("⚠️ All fields must be numeric.")
             else:
-                pred = heart_disease_model.predict([inputs])[0]
-                diagnosis = (
-                    'The person is having heart disease'
-                    if pred == 1 else
-                    'The person does not have any heart disease'
-                )
-                st.success(diagnosis)
-
-                # Build submission dict & save to DB
-                submission = {
-                    'id'     : patient_id,
-                    'age'    : age,
-                    'sex'    : sex,
-                    'cp'     : cp,
-                    'trestbps': trestbps,
-                    'chol'   : chol,
-                    'fbs'    : fbs,
-                    'restecg': restecg,
-                    'thalach': thalach,
-                    'exang'  : exang,
-                    'oldpeak': oldpeak,
-                    'slope'  : slope,
-                    'ca'     : ca,
-                    'thal'   : thal,
-                    'diagnosis': diagnosis
-                }
-                save_submission_db(submission)
+                st.success(submission['diagnosis'])
+                st.metric("Estimated risk (model probability)", risk_text(submission['probability']))
+                # The next patient gets a fresh ID
+                del st.session_state['patient_id']
 
                 # Generate a single-patient PDF
                 pdf_buf = generate_pdf(submission)
@@ -282,6 +128,46 @@ elif selected == "Heart Disease Detection":
                     file_name=f"report_{patient_id}.pdf",
                     mime="application/pdf"
                 )
+                stats = result_cache.stats()
+                st.caption(
+                    f"Result cache: {stats['hits']} hits, {stats['misses']} misses "
+                    f"({stats['hit_rate']:.0%} hit rate), {stats['entries']} entries"
+                )
+
+        # What-if: how the risk moves along one feature, all points scored in
+        # one batched model call (nothing is saved)
+        with st.expander("🔍 What-if: vary one feature"):
+            from scoring import (
+                FEATURE_COLS, FEATURE_RANGES, parse_features, sweep, sweep_values
+            )
+            try:
+                inputs = parse_features([age, sex, cp, trestbps, chol, fbs, restecg,
+                                         thalach, exang, oldpeak, slope, ca, thal])
+            except ValueError:
+                st.info("Fill in all fields with numbers to explore the risk.")
+            else:
+                import pandas as pd
+                wcol1, wcol2 = st.columns([1, 2])
+                with wcol1:
+                    feature = st.selectbox("Feature", FEATURE_COLS,
+                                           index=FEATURE_COLS.index('chol'), key='whatif_feature')
+                low, high = FEATURE_RANGES[feature]
+                current = inputs[FEATURE_COLS.index(feature)]
+                low, high = min(low, current), max(high, current)
+                with wcol2:
+                    low, high = st.slider("Range", min_value=float(low), max_value=float(high),
+                                          value=(float(low), float(high)),
+                                          key=f'whatif_range_{feature}')
+                grid = sweep_values(feature, low, high)
+                preds, probs = sweep(get_model(), inputs, feature, grid)
+                st.line_chart(pd.DataFrame({'Risk': probs}, index=pd.Index(grid, name=feature)))
+                flips = grid[1:][preds[1:] != preds[:-1]]
+                st.caption(
+                    f"Current {feature} = {current:g}. "
+                    + (f"The diagnosis changes at {feature} ≈ "
+                       + ", ".join(f"{v:.4g}" for v in flips) + "."
+                       if len(flips) else "The diagnosis is the same across this range.")
+                )
     else:
         st.warning("⚠️ Please log in to access the Heart Disease Detection.")
 
@@ -293,118 +179,285 @@ elif selected == "Bulk Reports":
         st.title("📥 Bulk PDF Report Generation")
 
         st.markdown("""
-        Upload a CSV with these columns (in this order):
+        Upload a CSV with these columns:
         
         `age, sex, cp, trestbps, chol, fbs, restecg, thalach, exang, oldpeak, slope, ca, thal, target`
         
         For each row, we will:
         1. Generate a new `patient_id` (YYYYMMDD_NNN).
-        2. Use `target` (0 or 1) to form the diagnosis text.
+        2. Use `target` (0 or 1), or optionally the model's own prediction, to form the diagnosis text.
         3. Build a PDF report.
-        4. Bundle ALL generated PDFs into a single ZIP for download.
+        4. Bundle ALL generated PDFs into a single ZIP for download, or (optionally)
+           into one combined PDF with one bookmarked page per patient.
         """)
 
         csv_file = st.file_uploader("Upload CSV", type=["csv"])
         if csv_file is not None:
+            from scoring import REQUIRED_COLS
+            from reports import default_pdf_workers
+            from bulk import missing_columns, count_rows
+            from jobs import submit_bulk_job
+
             try:
-                df = pd.read_csv(csv_file)
+                missing = missing_columns(csv_file)
             except Exception as e:
                 st.error(f"❌ Failed to parse CSV: {e}")
                 st.stop()
 
-            required_cols = [
-                'age','sex','cp','trestbps','chol','fbs',
-                'restecg','thalach','exang','oldpeak','slope','ca','thal','target'
-            ]
-            if not all(col in df.columns for col in required_cols):
-                st.error(f"❌ CSV must contain these columns (exact names): {required_cols}")
+            if missing:
+                st.error(f"❌ CSV must contain these columns (exact names): {REQUIRED_COLS}")
                 st.stop()
 
-            # Let user confirm how many records were read
-            st.success(f"✅ {len(df)} rows loaded.")
+            # Let user confirm how many records were found (counted, not parsed)
+            total_rows = count_rows(csv_file)
+            st.success(f"✅ {total_rows} rows found.")
+
+            use_model = st.checkbox(
+                "Use model prediction instead of the CSV's `target` column",
+                key='bulk_use_model'
+            )
+            combined = st.radio(
+                "Output",
+                ["ZIP of one PDF per patient", "One combined PDF (one page per patient)"],
+                key='bulk_output'
+            ).startswith("One combined")
+            workers, deflate = 1, False
+            if not combined:
+                workers = st.number_input(
+                    "PDF render workers", min_value=1, max_value=64,
+                    value=default_pdf_workers(), step=1, key='bulk_workers'
+                )
+                deflate = st.checkbox(
+                    "Deflate the ZIP (PDFs are already compressed, so this mostly costs CPU)",
+                    key='bulk_deflate'
+                )
 
             if st.button("Generate All Reports"):
-                with st.spinner("Generating PDFs…"):
-                    # Create an in-memory zip
-                    zip_buffer = BytesIO()
-                    with zipfile.ZipFile(zip_buffer, "w", compression=zipfile.ZIP_DEFLATED) as zipf:
-                        for idx, row in df.iterrows():
-                            pid = generate_patient_id()
-                            diag_text = (
-                                "The person is having heart disease"
-                                if int(row['target']) == 1 else
-                                "The person does not have any heart disease"
-                            )
-                            submission = {
-                                'id'      : pid,
-                                'age'     : row['age'],
-                                'sex'     : row['sex'],
-                                'cp'      : row['cp'],
-                                'trestbps': row['trestbps'],
-                                'chol'    : row['chol'],
-                                'fbs'     : row['fbs'],
-                                'restecg' : row['restecg'],
-                                'thalach' : row['thalach'],
-                                'exang'   : row['exang'],
-                                'oldpeak' : row['oldpeak'],
-                                'slope'   : row['slope'],
-                                'ca'      : row['ca'],
-                                'thal'    : row['thal'],
-                                'diagnosis': diag_text
-                            }
-
-                            # (Optional) save each bulk record to DB as well:
-                            save_submission_db(submission)
-
-                            # generate one PDF
-                            buf = generate_pdf(submission)
-                            # name: report_<patient_id>.pdf
-                            zipf.writestr(f"report_{pid}.pdf", buf.read())
-
-                    zip_buffer.seek(0)
-                    st.success("✅ All PDFs generated and zipped.")
-
-                    st.download_button(
-                        "📦 Download ZIP of All Reports",
-                        data=zip_buffer,
-                        file_name=f"bulk_reports_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
-                        mime="application/x-zip-compressed"
-                    )
+                # The work happens in a background worker (jobs.py), chunk by chunk
+                # with checkpoints, so it survives reruns, disconnects and restarts.
+                job_id = submit_bulk_job(
+                    csv_file, input_name=csv_file.name, total_rows=total_rows,
+                    use_model=use_model, combined=combined, deflate=deflate,
+                    workers=int(workers), created_by=st.session_state.get('username')
+                )
+                st.success(f"✅ Queued as job #{job_id}. Progress is shown below.")
         else:
             st.info("ℹ️ Please upload a CSV to begin.")
 
+        # Report jobs: active ones are polled in a fragment, so only this panel
+        # reruns while a job is in progress.
+        from jobs import ACTIVE, DONE, FAILED, delete_job, list_jobs, retry_job
+
+        jobs = list_jobs()
+        if jobs:
+            st.subheader("Report Jobs")
+
+        def _job_progress():
+            ensure_job_worker()  # fragment reruns skip the top of the script
+            active = [job for job in list_jobs() if job['status'] in ACTIVE]
+            if not active:
+                st.rerun()  # last job just finished: redraw the page with its download
+            for job in active:
+                st.progress(
+                    min(job['rows_done'] / max(job['total_rows'], 1), 1.0),
+                    text=f"Job #{job['id']} ({job['input_name']}): {job['status']}, "
+                         f"{job['rows_done']} / {job['total_rows']} reports"
+                )
+
+        if any(job['status'] in ACTIVE for job in jobs):
+            st.fragment(run_every=2)(_job_progress)()
+
+        for job in jobs:
+            if job['status'] == DONE:
+                jcol1, jcol2 = st.columns([4, 1])
+                name = os.path.basename(job['output_path'])
+                stem, ext = os.path.splitext(name)
+                label = (f"{'📄' if ext == '.pdf' else '📦'} Job #{job['id']} "
+                         f"({job['input_name']}, {job['rows_done']} reports)")
+                with jcol1:
+                    # Streamed from disk by the download route, never read into the session
+                    if not os.path.exists(job['output_path']):
+                        st.warning(f"⚠️ {label}: the output file is missing. "
+                                   f"Delete the job and run it again.")
+                    else:
+                        url = download_link(
+                            job['output_path'], f"{stem}_{job['id']}{ext}",
+                            "application/pdf" if ext == '.pdf' else "application/zip"
+                        )
+                        if url:
+                            st.link_button(label, url)
+                        else:
+                            st.caption(f"{label}: downloads are off (HDD_DOWNLOAD_PORT=0).")
+                with jcol2:
+                    st.button("Delete", key=f"job_delete_{job['id']}",
+                              on_click=delete_job, args=(job['id'],))
+            elif job['status'] == FAILED:
+                jcol1, jcol2 = st.columns([4, 1])
+                with jcol1:
+                    st.error(f"❌ Job #{job['id']} ({job['input_name']}) failed after "
+                             f"{job['rows_done']} rows: {job['error']}")
+                with jcol2:
+                    st.button("Retry", key=f"job_retry_{job['id']}",
+                              on_click=retry_job, args=(job['id'],))
+
 elif selected == "View Database":
     if not st.session_state.get('logged_in', False):
         st.warning("Please log in first to view the database.")
     else:
+        import tempfile
+        import pandas as pd
+        from db import get_conn, query_submissions, backup_to
+
         st.title("View & Download SQLite Database")
 
-        # 1) Display all submissions
-        conn = sqlite3.connect(DB_FILE)
-        submissions_df = pd.read_sql_query("SELECT * FROM submissions", conn)
-        st.subheader("All Heart‐Disease Submissions")
-        st.dataframe(submissions_df)
+        # 1) Browse submissions, one page at a time, filtered in SQL
+        st.subheader("Heart‐Disease Submissions")
+        with st.expander("Filters"):
+            fcol1, fcol2, fcol3 = st.columns(3)
+            with fcol1:
+                date_range = st.date_input("Date range", value=(), key='db_dates')
+                diag_choice = st.selectbox(
+                    "Diagnosis", ["All", "Heart disease", "No heart disease"], key='db_diag'
+                )
+                created_by = st.text_input("Created by (username)", key='db_created_by')
+            with fcol2:
+                age_min = st.number_input("Age from", value=None, key='db_age_min')
+                age_max = st.number_input("Age to", value=None, key='db_age_max')
+            with fcol3:
+                chol_min = st.number_input("Cholesterol from", value=None, key='db_chol_min')
+                chol_max = st.number_input("Cholesterol to", value=None, key='db_chol_max')
+        page_size = st.selectbox("Rows per page", [50, 100, 500], index=1, key='db_page_size')
+
+        filters = {
+            'date_from': date_range[0] if len(date_range) > 0 else None,
+            'date_to'  : date_range[-1] if len(date_range) > 0 else None,
+            'diagnosis': {"Heart disease": 1, "No heart disease": 0}.get(diag_choice),
+            'created_by': created_by.strip() or None,
+            'age_min'  : age_min, 'age_max': age_max,
+            'chol_min' : chol_min, 'chol_max': chol_max,
+        }
+
+        # Keyset cursors of the pages visited so far; reset when the query changes
+        query_key = repr((filters, page_size))
+        if st.session_state.get('db_query_key') != query_key:
+            st.session_state.db_query_key = query_key
+            st.session_state.db_cursors = [None]
+        cursors = st.session_state.db_cursors
+
+        page_df, next_cursor = query_submissions(filters, before=cursors[-1], limit=page_size)
+        st.dataframe(page_df, column_config={
+            'probability': st.column_config.ProgressColumn(
+                "Risk", format="%.2f", min_value=0.0, max_value=1.0
+            )
+        })
+
+        pcol1, pcol2, pcol3 = st.columns([1, 1, 4])
+        def _prev_page():
+            if len(st.session_state.db_cursors) > 1:
+                st.session_state.db_cursors.pop()
+
+        def _next_page(cursor):
+            if cursor is not None:
+                st.session_state.db_cursors.append(cursor)
+
+        with pcol1:
+            st.button("◀ Previous", disabled=len(cursors) == 1, key='db_prev',
+                      on_click=_prev_page)
+        with pcol2:
+            st.button("Next ▶", disabled=next_cursor is None, key='db_next',
+                      on_click=_next_page, args=(next_cursor,))
+        with pcol3:
+            st.caption(f"Page {len(cursors)}")
 
         st.markdown("---")
 
         # 2) Optionally, display all registered users
-        users_df = pd.read_sql_query("SELECT username, name FROM users", conn)
+        users_df = pd.read_sql_query("SELECT username, name FROM users", get_conn())
         st.subheader("Registered Users")
         st.dataframe(users_df)
 
-        conn.close()
-
         st.markdown("---")
 
-        # 3) Download the raw SQLite file
-        with open(DB_FILE, "rb") as f:
-            db_bytes = f.read()
-        st.download_button(
-            label="Download Raw SQLite File",
-            data=db_bytes,
-            file_name="submissions.db",
-            mime="application/x-sqlite3"
+        # 3) Download a consistent online backup of the SQLite file, built on demand
+        if st.button("Prepare Database Backup"):
+            with st.spinner("Backing up database…"):
+                backup_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+                backup_file.close()
+                backup_to(backup_file.name)
+            # Streamed from disk by the download route; the copy is removed when the link expires
+            url = download_link(backup_file.name, "submissions.db", "application/x-sqlite3",
+                                delete=True)
+            if url:
+                st.link_button("Download Raw SQLite File", url)
+            else:
+                os.remove(backup_file.name)
+                st.caption("Downloads are off (HDD_DOWNLOAD_PORT=0).")
+
+        # 4) Incremental columnar export for analytics (see export.py)
+        if st.button("Export New Rows to Parquet"):
+            from export import dataset_dir, export_submissions
+            try:
+                with st.spinner("Exporting submissions…"):
+                    result = export_submissions('parquet')
+            except ImportError as e:
+                st.error(f"❌ {e}")
+            else:
+                st.success(
+                    f"✅ Exported {result['rows']} new rows ({result['files']} files) "
+                    f"to `{dataset_dir('parquet')}`."
+                )
+
+elif selected == "Dashboard":
+    if not st.session_state.get('logged_in', False):
+        st.warning("Please log in first to view the dashboard.")
+    else:
+        import time
+        import pandas as pd
+        from aggregates import HISTOGRAM_BUCKETS, daily_summary, histogram
+
+        st.title("Submissions Dashboard")
+
+        # Everything here reads the summary tables kept by aggregates.py,
+        # never the submissions table itself
+        start = time.perf_counter()
+        date_range = st.date_input("Date range", value=(), key='dash_dates')
+        date_from = date_range[0] if len(date_range) > 0 else None
+        date_to = date_range[-1] if len(date_range) > 0 else None
+
+        days = pd.DataFrame(
+            daily_summary(date_from, date_to),
+            columns=['day', 'total', 'positive', 'scored', 'mean_risk']
         )
+        if days.empty:
+            st.info("No submissions in this date range yet.")
+        else:
+            days['day'] = pd.to_datetime(days['day'], format="%Y%m%d")
+            total, positive, scored = days[['total', 'positive', 'scored']].sum()
+            mcol1, mcol2, mcol3 = st.columns(3)
+            mcol1.metric("Submissions", f"{total:,}")
+            mcol2.metric("Heart disease", f"{positive / total:.1%}")
+            mcol3.metric(
+                "Mean model risk",
+                f"{(days['mean_risk'] * days['scored']).sum() / scored:.2f}" if scored else "n/a"
+            )
+
+            st.subheader("Submissions per day")
+            st.bar_chart(
+                days.assign(**{'Heart disease': days['positive'],
+                               'No heart disease': days['total'] - days['positive']}),
+                x='day', y=['No heart disease', 'Heart disease']
+            )
+
+            st.subheader("Feature distributions")
+            hcols = st.columns(2)
+            for i, feature in enumerate(HISTOGRAM_BUCKETS):
+                hist = pd.DataFrame(histogram(feature, date_from, date_to),
+                                    columns=[feature, 'No heart disease', 'Heart disease'])
+                with hcols[i % 2]:
+                    st.caption(f"{feature} (bucket width {HISTOGRAM_BUCKETS[feature]})")
+                    st.bar_chart(hist, x=feature, y=['No heart disease', 'Heart disease'])
+
+        st.caption(f"Loaded in {(time.perf_counter() - start) * 1000:.0f} ms")
 
 else:
     st.info("Select a menu item from the sidebar.")
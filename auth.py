@@ -0,0 +1,173 @@
+# auth.py
+#
+# Password hashing and login throttling. bcrypt runs on a small, bounded
+# thread pool (bcrypt releases the GIL while hashing), so however many
+# sessions log in at once, at most AUTH_THREADS cores are spent on it and
+# excess attempts are turned away instead of queueing without limit.
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from metrics import counter, histogram
+
+# Cost factor for new hashes; existing hashes with another cost are
+# rehashed transparently on the next successful login.
+BCRYPT_ROUNDS = int(os.environ.get('HDD_BCRYPT_ROUNDS', '12'))
+AUTH_THREADS = int(os.environ.get('HDD_AUTH_THREADS', str(min(4, os.cpu_count() or 1))))
+MAX_PENDING = AUTH_THREADS * 8  # hash/verify calls admitted at once (running + queued)
+
+# Failed logins allowed per window before further attempts are refused.
+WINDOW_S = 15 * 60
+MAX_FAILURES_PER_USER = 5
+MAX_FAILURES_PER_IP = 20
+# Bounds on the throttle's memory under a flood of failures from new
+# usernames/IPs: expired keys are swept this often, and past MAX_KEYS the
+# oldest keys that aren't locked out are forgotten.
+SWEEP_INTERVAL_S = 60
+MAX_KEYS = 50_000
+
+
+class AuthBusy(Exception):
+    """Raised when too many hash/verify calls are already pending."""
+
+
+# ─── 1) Hashing on a bounded pool ─────────────────────────────────────────────────
+_executor = ThreadPoolExecutor(max_workers=AUTH_THREADS, thread_name_prefix='bcrypt')
+_admission = threading.BoundedSemaphore(MAX_PENDING)
+
+_busy = counter('auth_busy', "Hash/verify calls refused because the pool was full")
+_queue_wait = histogram('bcrypt_queue_wait', "Time a hash/verify call waited for a thread")
+_hash_time = histogram('bcrypt_hash', "bcrypt hash time")
+_verify_time = histogram('bcrypt_verify', "bcrypt verify time")
+
+def _timed_call(hist, submitted: float, fn, *args):
+    started = time.perf_counter()
+    _queue_wait.observe(started - submitted)
+    try:
+        return fn(*args)
+    finally:
+        hist.observe(time.perf_counter() - started)
+
+def _run(hist, fn, *args):
+    if not _admission.acquire(blocking=False):
+        _busy.inc()
+        raise AuthBusy("Too many login attempts in progress; please try again.")
+    try:
+        return _executor.submit(_timed_call, hist, time.perf_counter(), fn, *args).result()
+    finally:
+        _admission.release()
+
+def hash_password(plain: str, rounds: int = None) -> str:
+    """Returns a bcrypt hash of `plain` (BCRYPT_ROUNDS by default)."""
+    salt = bcrypt.gensalt(rounds or BCRYPT_ROUNDS)
+    return _run(_hash_time, bcrypt.hashpw, plain.encode(), salt).decode()
+
+def _checkpw(plain: bytes, hashed: bytes) -> bool:
+    try:
+        return bcrypt.checkpw(plain, hashed)
+    except ValueError:  # malformed hash, or a password bcrypt refuses (> 72 bytes)
+        return False
+
+def verify_password(plain: str, hashed: str) -> bool:
+    return _run(_verify_time, _checkpw, plain.encode(), hashed.encode())
+
+def hash_rounds(hashed: str) -> int:
+    """The cost factor of a '$2b$12$...' hash, or 0 if it can't be read."""
+    try:
+        return int(hashed.split('$')[2])
+    except (IndexError, ValueError):
+        return 0
+
+def needs_rehash(hashed: str) -> bool:
+    return hash_rounds(hashed) != BCRYPT_ROUNDS
+
+# ─── 2) Throttling ────────────────────────────────────────────────────────────────
+class LoginThrottle:
+    """
+    Sliding-window count of failed logins per key (e.g. 'user:alice',
+    'ip:10.0.0.7'). Checked before any bcrypt work, so refused attempts
+    cost nothing. Holds at most `max_keys` keys that aren't locked out;
+    a locked key is kept until its window passes, so flooding the
+    throttle with new keys can't unlock it.
+    """
+
+    def __init__(self, window_s: float = WINDOW_S, max_keys: int = MAX_KEYS):
+        self.window_s = window_s
+        self.max_keys = max_keys
+        self._failures = OrderedDict()  # oldest key first
+        self._limits = {}  # key -> max failures, from record_failure
+        self._last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _prune(self, key: str, now: float) -> deque:
+        failures = self._failures.get(key)
+        if failures is None:
+            return deque()
+        while failures and failures[0] <= now - self.window_s:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            self._limits.pop(key, None)
+        return failures
+
+    def retry_after(self, limits: dict) -> float:
+        """
+        Seconds until an attempt is allowed for every {key: max_failures}
+        in `limits` (0 if allowed now).
+        """
+        now = time.monotonic()
+        wait = 0.0
+        with self._lock:
+            for key, limit in limits.items():
+                failures = self._prune(key, now)
+                if len(failures) >= limit:
+                    wait = max(wait, failures[len(failures) - limit] + self.window_s - now)
+        return wait
+
+    def _evict(self, now: float):
+        # Oldest first; locked keys are moved to the back instead, so each
+        # is looked at once per call
+        for _ in range(len(self._failures)):
+            if len(self._failures) <= self.max_keys:
+                return
+            key = next(iter(self._failures))
+            if len(self._prune(key, now)) >= self._limits.get(key, 1):
+                self._failures.move_to_end(key)
+            elif key in self._failures:
+                del self._failures[key]
+                self._limits.pop(key, None)
+
+    def record_failure(self, limits: dict):
+        """Counts a failed attempt against every {key: max_failures} in `limits`."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep >= SWEEP_INTERVAL_S:
+                # Keys whose window has passed are otherwise only pruned
+                # when the same username/IP tries again
+                for key in list(self._failures):
+                    self._prune(key, now)
+                self._last_sweep = now
+            for key, limit in limits.items():
+                self._failures.setdefault(key, deque()).append(now)
+                self._limits[key] = limit
+            # Still too many live keys: forget the oldest unlocked ones
+            self._evict(now)
+
+    def reset(self, key: str):
+        with self._lock:
+            self._failures.pop(key, None)
+            self._limits.pop(key, None)
+
+throttle = LoginThrottle()
+
+def login_limits(username: str, ip: str = None) -> dict:
+    """The throttle keys and limits that apply to one login attempt."""
+    limits = {f"user:{username}": MAX_FAILURES_PER_USER}
+    if ip:
+        limits[f"ip:{ip}"] = MAX_FAILURES_PER_IP
+    return limits
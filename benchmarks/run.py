@@ -0,0 +1,326 @@
+# benchmarks/run.py
+#
+# Headless benchmark suite for the hot paths: model inference, patient IDs,
+# submission inserts, PDF rendering and the full CSV -> ZIP bulk job. Runs
+# on synthetic patients against a throwaway database and job directory, so
+# the app's own data is never touched and Streamlit is never imported.
+#
+#   python benchmarks/run.py                                # default scales
+#   python benchmarks/run.py --scales 1,1000,1000000 --json results.json
+#   python benchmarks/run.py --only predict,db --compare baseline.json
+#
+# Each case runs once to warm up, then --repeat times; the median is what is
+# reported and compared. With --compare, a case whose median is more than
+# --threshold slower than the baseline's is flagged and the exit status is 1.
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GROUPS = ('predict', 'patient_id', 'db', 'pdf', 'bulk')
+DEFAULT_SCALES = (1, 100, 10_000)
+LOOP_CALLS = 200      # calls timed by the one-at-a-time cases, whatever the scale
+BULK_MAX_ROWS = 10_000  # the CSV -> ZIP job renders a PDF per row; larger scales are skipped
+
+# ─── 1) Synthetic data ────────────────────────────────────────────────────────────
+def synthetic_patients(n: int, seed: int = 0):
+    """
+    A DataFrame of `n` patients with the 13 features (in the value ranges of
+    the UCI heart dataset) and a `target`, all float64 like a parsed CSV.
+    """
+    import numpy as np
+    import pandas as pd
+    from scoring import REQUIRED_COLS
+
+    rng = np.random.default_rng(seed)
+    cols = {
+        'age'     : rng.integers(29, 78, n),
+        'sex'     : rng.integers(0, 2, n),
+        'cp'      : rng.integers(0, 4, n),
+        'trestbps': rng.integers(94, 201, n),
+        'chol'    : rng.integers(126, 565, n),
+        'fbs'     : rng.integers(0, 2, n),
+        'restecg' : rng.integers(0, 3, n),
+        'thalach' : rng.integers(71, 203, n),
+        'exang'   : rng.integers(0, 2, n),
+        'oldpeak' : rng.integers(0, 63, n) / 10,
+        'slope'   : rng.integers(0, 3, n),
+        'ca'      : rng.integers(0, 5, n),
+        'thal'    : rng.integers(0, 4, n),
+        'target'  : rng.integers(0, 2, n),
+    }
+    return pd.DataFrame(cols)[REQUIRED_COLS].astype('float64')
+
+def _submissions(frame, prefix: str) -> list:
+    """Submission dicts (as the Detection page builds them) for a DataFrame."""
+    from scoring import FEATURE_COLS, diagnosis_texts
+
+    subs = frame[FEATURE_COLS].assign(
+        id=[f"{prefix}_{i:06d}" for i in range(len(frame))],
+        diagnosis=diagnosis_texts(frame['target'].to_numpy()),
+    )
+    return subs.to_dict('records')
+
+# ─── 2) Timing ────────────────────────────────────────────────────────────────────
+class Case:
+    """One timed operation over `rows` rows; setup() runs untimed before each run."""
+
+    def __init__(self, name: str, rows: int, fn, setup=None):
+        self.name, self.rows, self.fn, self.setup = name, rows, fn, setup
+
+    def run(self, repeat: int) -> dict:
+        times = []
+        for i in range(repeat + 1):  # the first run is a warm-up
+            if self.setup is not None:
+                self.setup()
+            start = time.perf_counter()
+            self.fn()
+            if i:
+                times.append(time.perf_counter() - start)
+        median = statistics.median(times)
+        return {
+            'rows': self.rows, 'runs': repeat,
+            'median_s': median, 'min_s': min(times),
+            'us_per_row': median / self.rows * 1e6,
+            'rows_per_s': self.rows / median if median else None,
+        }
+
+# ─── 3) Cases ─────────────────────────────────────────────────────────────────────
+def predict_cases(scales, seed: int):
+    import pickle
+    from scoring import (
+        MODEL_FILE, SCORER_FILE, FEATURE_COLS, LinearScorer, feature_matrix,
+        predict_batch, predict_one, score_batch, sweep, sweep_values
+    )
+
+    with open(MODEL_FILE, 'rb') as f:
+        models = {'sklearn': pickle.load(f)}
+    if os.path.exists(SCORER_FILE):
+        models['scorer'] = LinearScorer.load(SCORER_FILE)
+    one = synthetic_patients(LOOP_CALLS, seed)[FEATURE_COLS].to_numpy().tolist()
+    for kind, model in models.items():
+        yield Case(f"predict/single[{kind}]", LOOP_CALLS,
+                   lambda model=model: [predict_one(model, row) for row in one])
+        grid = sweep_values('chol', 126, 564)
+        yield Case(f"predict/what_if_sweep[{kind}]", len(grid),
+                   lambda model=model: sweep(model, one[0], 'chol', grid))
+        for n in scales:
+            X = feature_matrix(synthetic_patients(n, seed))
+            yield Case(f"predict/batch[{kind}]/n={n}", n,
+                       lambda model=model, X=X: predict_batch(model, X))
+            yield Case(f"predict/batch_with_proba[{kind}]/n={n}", n,
+                       lambda model=model, X=X: score_batch(model, X))
+
+def patient_id_cases(scales, seed: int):
+    """
+    generate_patient_id() when `n` IDs already exist for today: the first
+    call of the day counts them (cold), later calls only bump the counter.
+    """
+    from db import generate_patient_id, save_submissions_bulk, transaction
+
+    today = datetime.now().strftime("%Y%m%d")
+
+    def fill(n):
+        def setup():
+            with transaction() as conn:
+                conn.execute("DELETE FROM submissions")
+                conn.execute("DELETE FROM patient_id_seq")
+            frame = synthetic_patients(n, seed)
+            frame['id'] = [f"{today}_{i:03d}" for i in range(1, n + 1)]
+            frame['prediction'] = frame['target']
+            save_submissions_bulk(frame)
+        return setup
+
+    def reset_counter():
+        with transaction() as conn:
+            conn.execute("DELETE FROM patient_id_seq")
+
+    for n in scales:
+        setup = fill(n)
+        setup()
+        yield Case(f"patient_id/first_of_day/day_rows={n}", 1, generate_patient_id,
+                   setup=reset_counter)
+        yield Case(f"patient_id/next/day_rows={n}", LOOP_CALLS,
+                   lambda: [generate_patient_id() for _ in range(LOOP_CALLS)])
+
+def db_cases(scales, seed: int):
+    from db import save_submission_db, save_submissions_bulk, transaction
+
+    today = datetime.now().strftime("%Y%m%d")
+
+    def empty():
+        with transaction() as conn:
+            conn.execute("DELETE FROM submissions")
+            conn.execute("DELETE FROM agg_daily")
+            conn.execute("DELETE FROM agg_histogram")
+
+    subs = _submissions(synthetic_patients(LOOP_CALLS, seed), f"{today}_S")
+    yield Case("db/save_submission_db", LOOP_CALLS,
+               lambda: [save_submission_db(sub) for sub in subs], setup=empty)
+    for n in scales:
+        frame = synthetic_patients(n, seed)
+        frame['id'] = [f"{today}_B{i:07d}" for i in range(n)]
+        frame['prediction'] = frame['target']
+        yield Case(f"db/save_submissions_bulk/n={n}", n,
+                   lambda frame=frame: save_submissions_bulk(frame), setup=empty)
+
+def pdf_cases(scales, seed: int):
+    from reports import build_pdf, generate_pdf
+
+    subs = _submissions(synthetic_patients(LOOP_CALLS, seed), 'P')
+    yield Case("pdf/generate_pdf", LOOP_CALLS, lambda: [generate_pdf(s) for s in subs])
+    yield Case("pdf/build_pdf[full layout]", LOOP_CALLS,
+               lambda: [build_pdf(s).output() for s in subs])
+
+def bulk_cases(scales, seed: int):
+    """
+    The Bulk Reports flow end to end (CSV -> score -> PDFs -> ZIP + DB rows):
+    as a queued job, and in-process as `python hdd.py bulk` runs it.
+    """
+    import jobs
+    from cache import shared_cache
+    from hdd import run_bulk
+
+    def run(csv: bytes, n: int):
+        job_id = jobs.submit_bulk_job(io.BytesIO(csv), 'bench.csv', n, use_model=True)
+        jobs.run_job(jobs.claim_job())
+        job = jobs.get_job(job_id)
+        if job['status'] != jobs.DONE:
+            raise RuntimeError(f"Bulk job failed: {job['error']}")
+        jobs.delete_job(job_id)
+
+    for n in scales:
+        if n > BULK_MAX_ROWS:
+            print(f"  (skipping bulk/csv_to_zip/n={n}: above BULK_MAX_ROWS={BULK_MAX_ROWS})")
+            continue
+        csv = synthetic_patients(n, seed).to_csv(index=False).encode()
+        # Cold result cache each run, so every report body is rendered
+        yield Case(f"bulk/csv_to_zip/n={n}", n, lambda csv=csv, n=n: run(csv, n),
+                   setup=shared_cache().clear)
+        csv_path = os.path.join(os.path.dirname(jobs.JOBS_DIR), f"bench-{n}.csv")
+        with open(csv_path, 'wb') as f:
+            f.write(csv)
+        yield Case(f"bulk/run_bulk/n={n}", n,
+                   lambda csv_path=csv_path: run_bulk(csv_path, csv_path + '.zip',
+                                                      use_model=True),
+                   setup=shared_cache().clear)
+
+CASES = {
+    'predict'   : predict_cases,
+    'patient_id': patient_id_cases,
+    'db'        : db_cases,
+    'pdf'       : pdf_cases,
+    'bulk'      : bulk_cases,
+}
+
+# ─── 4) Comparison ────────────────────────────────────────────────────────────────
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Prints current vs baseline medians for the cases both runs have and
+    returns the names of those more than `threshold` (0.1 = 10%) slower.
+    """
+    regressions = []
+    print(f"\n{'case':<48}{'base ms':>11}{'now ms':>11}{'ratio':>8}")
+    for name, now in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<48}{'-':>11}{now['median_s'] * 1e3:>11.3f}{'new':>8}")
+            continue
+        ratio = now['median_s'] / base['median_s']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        elif ratio < 1 / (1 + threshold):
+            flag = '  faster'
+        print(f"{name:<48}{base['median_s'] * 1e3:>11.3f}{now['median_s'] * 1e3:>11.3f}"
+              f"{ratio:>8.2f}{flag}")
+    return regressions
+
+# ─── 5) Entry point ───────────────────────────────────────────────────────────────
+def _meta(args) -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'time': datetime.now().isoformat(timespec='seconds'), 'commit': commit,
+        'python': platform.python_version(), 'platform': platform.platform(),
+        'cpus': os.cpu_count(), 'scales': args.scales, 'repeat': args.repeat,
+        'seed': args.seed,
+    }
+
+def _sandbox(workdir: str):
+    """Points the app modules at a scratch DB and job dir (before they're imported)."""
+    os.environ['HDD_DB_FILE'] = os.path.join(workdir, 'bench.db')
+    os.environ['HDD_JOBS_DIR'] = os.path.join(workdir, 'jobs')
+    os.environ['HDD_METRICS_PORT'] = '0'
+    os.chdir(ROOT)  # model files are found relative to the repo
+    sys.path.insert(0, ROOT)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Hot-path benchmark suite")
+    parser.add_argument('--scales', default=','.join(map(str, DEFAULT_SCALES)),
+                        help="comma-separated row counts (1 to 1000000)")
+    parser.add_argument('--only', help=f"comma-separated groups out of {', '.join(GROUPS)}")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help="results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="slowdown that counts as a regression (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+    args.scales = [int(s) for s in args.scales.split(',')]
+    groups = args.only.split(',') if args.only else list(GROUPS)
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"unknown groups: {', '.join(sorted(unknown))}")
+
+    # Resolve output paths before _sandbox() changes directory
+    args.json = args.json and os.path.abspath(args.json)
+    args.compare = args.compare and os.path.abspath(args.compare)
+
+    with tempfile.TemporaryDirectory(prefix='hdd-bench-') as workdir:
+        _sandbox(workdir)
+        import logging
+        import warnings
+        warnings.simplefilter('ignore')
+        logging.disable(logging.WARNING)
+        from db import close_all, init_db
+        init_db()
+
+        results = {}
+        print(f"{'case':<48}{'median ms':>11}{'us/row':>11}{'rows/s':>13}")
+        for group in groups:
+            for case in CASES[group](args.scales, args.seed):
+                r = results[case.name] = case.run(args.repeat)
+                print(f"{case.name:<48}{r['median_s'] * 1e3:>11.3f}"
+                      f"{r['us_per_row']:>11.2f}{r['rows_per_s']:>13,.0f}")
+        close_all()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'meta': _meta(args), 'results': results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# benchmarks/startup.py
+#
+# Cold-start benchmark: for each page route in app.py, measures in a fresh
+# interpreter how long the app's top-level imports plus that route's own
+# imports take. The routes and their imports are read from app.py's source,
+# so the benchmark follows the app as it changes.
+#
+#   python benchmarks/startup.py [--runs 5] [--json startup.json]
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_FILE = os.path.join(ROOT, 'app.py')
+
+def _imported_modules(nodes) -> list:
+    """Module names imported anywhere inside the given AST nodes, in order."""
+    mods = []
+    for node in nodes:
+        for sub in ast.walk(node):
+            if isinstance(sub, ast.Import):
+                mods += [alias.name for alias in sub.names]
+            elif isinstance(sub, ast.ImportFrom) and sub.module and not sub.level:
+                mods.append(sub.module)
+    return list(dict.fromkeys(mods))
+
+def page_imports(app_file: str = APP_FILE):
+    """
+    Returns (base_modules, {route: modules}) by walking app.py's
+    `if selected == "<route>": ... elif ...` chain.
+    """
+    with open(app_file, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    base = _imported_modules(
+        [n for n in tree.body if isinstance(n, (ast.Import, ast.ImportFrom))]
+    )
+    routes = {}
+    for node in tree.body:
+        while isinstance(node, ast.If):
+            test = node.test
+            if (isinstance(test, ast.Compare) and isinstance(test.left, ast.Name)
+                    and test.left.id == 'selected'
+                    and isinstance(test.comparators[0], ast.Constant)):
+                routes[test.comparators[0].value] = _imported_modules(node.body)
+            node = node.orelse[0] if len(node.orelse) == 1 else None
+    return base, routes
+
+_PROBE = """
+import importlib, json, sys, time, warnings, logging
+warnings.simplefilter('ignore')
+logging.disable(logging.WARNING)
+base, route = json.loads(sys.argv[1])
+t0 = time.perf_counter()
+for m in base: importlib.import_module(m)
+t1 = time.perf_counter()
+for m in route: importlib.import_module(m)
+t2 = time.perf_counter()
+print(json.dumps({'base_ms': (t1 - t0) * 1e3, 'route_ms': (t2 - t1) * 1e3,
+                  'modules': len(sys.modules)}))
+"""
+
+def measure(base: list, route: list) -> dict:
+    """Imports base then route modules in a fresh interpreter; returns timings."""
+    out = subprocess.run(
+        [sys.executable, '-c', _PROBE, json.dumps([base, route])],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-route cold-start import benchmark")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    base, routes = page_imports()
+    results = {}
+    print(f"{'route':<26}{'base ms':>10}{'route ms':>10}{'total ms':>10}{'modules':>9}")
+    for route, mods in routes.items():
+        runs = [measure(base, mods) for _ in range(args.runs)]
+        base_ms = statistics.median(r['base_ms'] for r in runs)
+        route_ms = statistics.median(r['route_ms'] for r in runs)
+        results[route] = {
+            'imports': mods, 'base_ms': base_ms, 'route_ms': route_ms,
+            'total_ms': base_ms + route_ms, 'modules': runs[-1]['modules'],
+        }
+        print(f"{route:<26}{base_ms:>10.1f}{route_ms:>10.1f}"
+              f"{base_ms + route_ms:>10.1f}{runs[-1]['modules']:>9}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'base_imports': base, 'routes': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
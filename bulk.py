@@ -0,0 +1,74 @@
+# bulk.py
+
+from contextlib import closing
+
+import pandas as pd
+
+from scoring import REQUIRED_COLS, check_frame
+
+# Explicit dtypes so pandas never has to infer (or upcast) a column per chunk.
+CSV_DTYPES = {col: 'float64' for col in REQUIRED_COLS}
+DEFAULT_CHUNK_ROWS = 5000
+
+def missing_columns(fileobj) -> list:
+    """
+    Reads only the CSV header and returns any required columns it lacks.
+    The file is rewound afterwards.
+    """
+    fileobj.seek(0)
+    header = pd.read_csv(fileobj, nrows=0)
+    fileobj.seek(0)
+    return [col for col in REQUIRED_COLS if col not in header.columns]
+
+def count_rows(fileobj, block_size: int = 1 << 20) -> int:
+    """
+    Counts data rows (excluding the header) by scanning for newlines in
+    fixed-size blocks, without parsing. The file is rewound afterwards.
+    """
+    fileobj.seek(0)
+    lines, last = 0, b'\n'
+    while True:
+        block = fileobj.read(block_size)
+        if not block:
+            break
+        if isinstance(block, str):
+            block = block.encode()
+        lines += block.count(b'\n')
+        last = block[-1:]
+    fileobj.seek(0)
+    if last != b'\n':
+        lines += 1  # final line has no trailing newline
+    return max(lines - 1, 0)
+
+def read_csv_chunks(fileobj, chunksize: int = DEFAULT_CHUNK_ROWS, skip_rows: int = 0):
+    """
+    Yields DataFrames of at most `chunksize` rows holding just the required
+    columns as float64, so memory stays bounded by the chunk size.
+    The first `skip_rows` data rows are skipped (e.g. to resume a job); each
+    chunk is indexed by data row number in the file, starting at 0.
+    """
+    fileobj.seek(0)
+    reader = pd.read_csv(
+        fileobj,
+        usecols=REQUIRED_COLS,
+        dtype=CSV_DTYPES,
+        chunksize=chunksize,
+        skiprows=range(1, skip_rows + 1) if skip_rows else None,
+    )
+    with reader:
+        for chunk in reader:
+            chunk.index += skip_rows
+            yield chunk
+
+def validate_csv(fileobj, use_model: bool = False, chunksize: int = DEFAULT_CHUNK_ROWS) -> int:
+    """
+    Reads the whole CSV once and raises the ValueError scoring would (naming
+    the bad lines), so a file that would fail part-way fails before anything
+    is saved. Returns the number of data rows.
+    """
+    rows = 0
+    with closing(read_csv_chunks(fileobj, chunksize)) as chunks:
+        for chunk in chunks:
+            check_frame(chunk, use_model)
+            rows += len(chunk)
+    return rows
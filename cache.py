@@ -0,0 +1,109 @@
+# cache.py
+#
+# Content-addressed cache of scoring results. Re-scored patients (reprints,
+# corrections, overlapping bulk uploads) skip the model and get their report
+# body (see reports.ReportTemplate.fill) without re-stamping it; only the
+# date and patient ID are filled in per report.
+
+import hashlib
+import os
+import struct
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+DEFAULT_MAX_BYTES = int(os.environ.get('HDD_RESULT_CACHE_MB', '64')) * 1024 * 1024
+
+_ENTRY_OVERHEAD = 200  # rough per-entry cost of the key, tuple and dict slot
+
+
+class CachedResult(NamedTuple):
+    prediction: int
+    body: tuple  # report body, or None if the report needs the full layout
+    probability: float = None  # model's risk score; None for CSV targets
+
+
+def result_key(features, source: str) -> bytes:
+    """
+    Key for one patient's 13 features, as floats (so "63", "63.0" and 63 hash
+    alike, as do 0.0 and -0.0), plus where the prediction comes from: the
+    model version, or e.g. 'target=1:<model version>' when the CSV supplies
+    it (the report still shows that model's risk).
+    """
+    packed = struct.pack('<13d', *(float(x) + 0.0 for x in features))
+    return hashlib.blake2b(packed + source.encode(), digest_size=16).digest()
+
+
+def _entry_size(result: CachedResult) -> int:
+    return _ENTRY_OVERHEAD + sum(len(part) for part in (result.body or ()))
+
+
+class ResultCache:
+    """
+    Thread-safe LRU of CachedResults, bounded by the approximate byte size
+    of the stored report bodies. Counts hits, misses and evictions.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes) -> CachedResult:
+        """Returns the cached result (marking it recently used), or None."""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: bytes, result: CachedResult):
+        """Stores a result, evicting least recently used ones to stay under max_bytes."""
+        size = _entry_size(result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= _entry_size(old)
+            self._entries[key] = result
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= _entry_size(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries'  : len(self._entries),
+            'bytes'    : self.size,
+            'max_bytes': self.max_bytes,
+            'hits'     : self.hits,
+            'misses'   : self.misses,
+            'evictions': self.evictions,
+            'hit_rate' : self.hits / lookups if lookups else 0.0,
+        }
+
+
+_shared = None
+
+def shared_cache() -> ResultCache:
+    """A process-wide ResultCache (e.g. for a jobs.py worker)."""
+    global _shared
+    if _shared is None:
+        _shared = ResultCache()
+    return _shared
@@ -0,0 +1,296 @@
+# db.py
+#
+# numpy/pandas/scoring are imported inside the functions that need them, so
+# the login pages can use this module without loading the data stack.
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from metrics import timed
+
+DB_FILE = os.environ.get('HDD_DB_FILE', 'submissions.db')
+
+BUSY_TIMEOUT_MS = 30_000
+POOL_SIZE = 8  # idle connections kept for reuse by new threads
+
+# Applied to every new connection. WAL lets readers run alongside the single
+# writer; synchronous=NORMAL is durable under WAL and only fsyncs at checkpoints.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",  # ~16 MB page cache
+    "PRAGMA foreign_keys = ON",
+)
+
+# ─── 1) Connection pool ───────────────────────────────────────────────────────────
+# Each thread gets its own connection. Streamlit runs every script rerun on a
+# fresh thread, so when a thread goes away its connection is handed back to an
+# idle list and picked up by the next thread instead of being reopened.
+_local = threading.local()
+_idle = []
+_idle_lock = threading.Lock()
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        DB_FILE,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,       # autocommit; use transaction() for writes
+        check_same_thread=False,    # connections move between threads via the pool
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def _release(conn: sqlite3.Connection):
+    if conn.in_transaction:
+        conn.rollback()
+    with _idle_lock:
+        if len(_idle) < POOL_SIZE:
+            _idle.append(conn)
+            return
+    conn.close()
+
+class _Lease:
+    """Owned by one thread's local storage; returns the connection when the thread ends."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __del__(self):
+        try:
+            _release(self.conn)
+        except Exception:
+            pass
+
+def get_conn() -> sqlite3.Connection:
+    """Returns this thread's pooled connection, opening one if needed."""
+    lease = getattr(_local, 'lease', None)
+    if lease is None:
+        with _idle_lock:
+            conn = _idle.pop() if _idle else None
+        lease = _Lease(conn if conn is not None else _connect())
+        _local.lease = lease
+    return lease.conn
+
+def close_all():
+    """Closes this thread's connection and every idle one (e.g. before deleting the DB)."""
+    lease = getattr(_local, 'lease', None)
+    if lease is not None:
+        del _local.lease
+    with _idle_lock:
+        conns, _idle[:] = list(_idle), []
+    for conn in conns:
+        conn.close()
+
+@contextmanager
+def transaction(immediate: bool = False):
+    """
+    Runs the block in one transaction on this thread's connection, committing
+    on success and rolling back on error. immediate=True takes the write lock
+    up front. Nested use joins the outer transaction.
+    """
+    conn = get_conn()
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+# ─── 2) Schema ────────────────────────────────────────────────────────────────────
+def init_db():
+    """Creates or upgrades every table to the current schema (see migrations.py)."""
+    from migrations import migrate
+    migrate()
+
+# ─── 3) Submission helpers ────────────────────────────────────────────────────────
+# The diagnosis is stored as a 0/1 prediction (see migrations.py, v2); the
+# sentence is rebuilt from it when reading.
+_INSERT_SUBMISSION = """
+    INSERT INTO submissions (
+        id, age, sex, cp, trestbps, chol, fbs, restecg, thalach, exang,
+        oldpeak, slope, ca, thal, prediction, probability, created_at, created_by
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+@timed('db_save_submission', "Saving one submission")
+def save_submission_db(sub: dict):
+    """
+    Insert one row into submissions table; a duplicate ID raises IntegrityError.
+    The prediction is sub['prediction'] if given, else read from its diagnosis
+    text; 'probability' and 'created_by' are optional.
+    """
+    from aggregates import HISTOGRAM_BUCKETS, record
+    from scoring import DIAGNOSIS_POSITIVE
+
+    prediction = sub.get('prediction')
+    if prediction is None:
+        prediction = sub['diagnosis'] == DIAGNOSIS_POSITIVE
+    prediction = int(prediction)
+    with transaction() as conn:
+        conn.execute(_INSERT_SUBMISSION, (
+            sub['id'],
+            float(sub['age']), float(sub['sex']), float(sub['cp']),
+            float(sub['trestbps']), float(sub['chol']), float(sub['fbs']),
+            float(sub['restecg']), float(sub['thalach']), float(sub['exang']),
+            float(sub['oldpeak']), float(sub['slope']), float(sub['ca']),
+            float(sub['thal']), prediction, sub.get('probability'),
+            int(time.time()), sub.get('created_by')
+        ))
+        record(conn, [(sub['id'], prediction, sub.get('probability'),
+                       *(float(sub[col]) for col in HISTOGRAM_BUCKETS))])
+
+@timed('db_save_bulk', "Saving one chunk of bulk submissions")
+def save_submissions_bulk(frame, created_by: str = None) -> int:
+    """
+    Inserts a whole DataFrame chunk of submissions (columns: id, the 13
+    features, and prediction or diagnosis; optionally probability) with one
+    executemany in a single transaction. Returns the number of rows written.
+    """
+    import numpy as np
+    from aggregates import HISTOGRAM_BUCKETS, record_frame
+    from scoring import DIAGNOSIS_POSITIVE, FEATURE_COLS
+
+    if len(frame) == 0:
+        return 0
+    # One vectorized float conversion for the whole block instead of per field.
+    features = frame[FEATURE_COLS].to_numpy(dtype=np.float64).tolist()
+    if 'prediction' in frame:
+        preds = frame['prediction'].to_numpy(dtype=np.int64).tolist()
+    else:
+        preds = (frame['diagnosis'].to_numpy() == DIAGNOSIS_POSITIVE).astype(np.int64).tolist()
+    probs = frame['probability'].tolist() if 'probability' in frame else [None] * len(frame)
+    ids = frame['id'].tolist()
+    now = int(time.time())
+    rows = (
+        (pid, *values, pred, prob, now, created_by)
+        for pid, values, pred, prob in zip(ids, features, preds, probs)
+    )
+    agg_frame = frame[list(HISTOGRAM_BUCKETS)].astype(np.float64).assign(
+        id=ids, prediction=preds, probability=np.array(probs, dtype=np.float64)
+    )
+    with transaction() as conn:
+        conn.executemany(_INSERT_SUBMISSION, rows)
+        record_frame(conn, agg_frame)
+    return len(features)
+
+@timed('db_reserve_patient_ids', "Reserving patient IDs (includes the write-lock wait)")
+def reserve_patient_ids(n: int) -> list:
+    """
+    Atomically reserves `n` consecutive IDs for today, of form YYYYMMDD_NNN.
+
+    Sequences live in the patient_id_seq counter table, one row per day, and
+    are advanced under a write lock (BEGIN IMMEDIATE), so concurrent sessions
+    never receive the same ID and a bulk job needs only one round trip.
+    """
+    if n <= 0:
+        return []
+    today = datetime.now().strftime("%Y%m%d")
+    with transaction(immediate=True) as conn:
+        row = conn.execute(
+            "SELECT last_seq FROM patient_id_seq WHERE day = ?", (today,)
+        ).fetchone()
+        if row is None:
+            # First ID of the day: continue after any rows written before the
+            # counter table existed (an index range scan on the primary key).
+            start = conn.execute(
+                "SELECT COUNT(*) FROM submissions WHERE id >= ? AND id < ?",
+                (f"{today}_", f"{today}`")
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO patient_id_seq (day, last_seq) VALUES (?, ?)",
+                (today, start + n)
+            )
+        else:
+            start = row[0]
+            conn.execute(
+                "UPDATE patient_id_seq SET last_seq = ? WHERE day = ?",
+                (start + n, today)
+            )
+    return [f"{today}_{seq:03d}" for seq in range(start + 1, start + n + 1)]
+
+@timed('patient_id_generate', "generate_patient_id()")
+def generate_patient_id() -> str:
+    """
+    Generates a sequential ID per day, of form YYYYMMDD_NNN.
+    """
+    return reserve_patient_ids(1)[0]  # e.g. '20250601_001'
+
+# ─── 4) Browsing & backup ─────────────────────────────────────────────────────────
+def _submission_filters(filters: dict):
+    """Builds the WHERE clauses and parameters for query_submissions()."""
+    clauses, params = [], []
+    if filters.get('date_from'):
+        clauses.append("id >= ?")
+        params.append(f"{filters['date_from']:%Y%m%d}_")
+    if filters.get('date_to'):
+        clauses.append("id < ?")
+        params.append(f"{filters['date_to']:%Y%m%d}`")  # '`' sorts just after '_'
+    if filters.get('diagnosis') is not None:
+        clauses.append("prediction = ?")
+        params.append(int(filters['diagnosis']))
+    if filters.get('created_by'):
+        clauses.append("created_by = ?")
+        params.append(filters['created_by'])
+    for col in ('age', 'chol'):
+        if filters.get(f'{col}_min') is not None:
+            clauses.append(f"{col} >= ?")
+            params.append(float(filters[f'{col}_min']))
+        if filters.get(f'{col}_max') is not None:
+            clauses.append(f"{col} <= ?")
+            params.append(float(filters[f'{col}_max']))
+    return clauses, params
+
+@timed('db_query_submissions', "One View Database page query")
+def query_submissions(filters: dict = None, before: int = None, limit: int = 100):
+    """
+    Returns one page of submissions, newest first, as (DataFrame, next_cursor).
+
+    Pages are keyset-paginated on row_id: pass the returned cursor as `before`
+    to fetch the next page, so deep pages cost the same as the first one.
+    Supported filters: date_from/date_to (dates, matched on the ID prefix),
+    diagnosis (0/1), created_by, age_min/age_max and chol_min/chol_max.
+    next_cursor is None on the last page.
+    """
+    import pandas as pd
+    from scoring import FEATURE_COLS, diagnosis_texts
+
+    clauses, params = _submission_filters(filters or {})
+    if before is not None:
+        clauses.append("row_id < ?")
+        params.append(before)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    page = pd.read_sql_query(
+        f"SELECT row_id, id, {', '.join(FEATURE_COLS)}, prediction, probability, "
+        f"created_at, created_by FROM submissions {where} "
+        f"ORDER BY row_id DESC LIMIT ?",
+        get_conn(), params=params + [limit + 1]
+    )
+    next_cursor = int(page['row_id'].iloc[limit - 1]) if len(page) > limit else None
+    page = page.head(limit)
+    page.insert(page.columns.get_loc('prediction'), 'diagnosis',
+                diagnosis_texts(page['prediction'].to_numpy()))
+    page['created_at'] = pd.to_datetime(page['created_at'], unit='s')
+    return page.drop(columns=['row_id', 'prediction']), next_cursor
+
+def backup_to(path: str):
+    """
+    Writes a consistent copy of the live database to `path` using SQLite's
+    online backup API, which copies pages incrementally and never blocks
+    writers for the whole copy.
+    """
+    dest = sqlite3.connect(path)
+    try:
+        get_conn().backup(dest, pages=1024)
+    finally:
+        dest.close()
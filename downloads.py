@@ -0,0 +1,151 @@
+# downloads.py
+#
+# Streams bulk-report outputs and database backups from disk. st.download_button
+# sends its whole payload through the session (and keeps it in memory while
+# the button is on screen), which a multi-GB ZIP can't afford; instead the page
+# shows a link to this small HTTP route, which copies the file to the socket a
+# chunk at a time.
+#
+# Files are published under an unguessable token and stop being served
+# HDD_DOWNLOAD_TTL_S seconds after they were last published:
+#   HDD_DOWNLOAD_PORT=8502          port the route listens on; 0 disables it
+#   HDD_DOWNLOAD_HOST=0.0.0.0       interface it listens on
+#   HDD_DOWNLOAD_URL=https://host/downloads
+#                                   base of the links when the route is behind a
+#                                   proxy (default: the page's host, on the port)
+#
+# Stdlib only, like metrics.py.
+
+import atexit
+import logging
+import os
+import secrets
+import shutil
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, urlsplit
+
+DOWNLOAD_PORT = int(os.environ.get('HDD_DOWNLOAD_PORT', '8502'))
+DOWNLOAD_HOST = os.environ.get('HDD_DOWNLOAD_HOST', '0.0.0.0')
+DOWNLOAD_URL = os.environ.get('HDD_DOWNLOAD_URL', '')
+DOWNLOAD_TTL_S = float(os.environ.get('HDD_DOWNLOAD_TTL_S', '3600'))
+CHUNK_BYTES = 1 << 20
+
+log = logging.getLogger('hdd.downloads')
+
+_lock = threading.Lock()
+_files = {}    # token -> {'path', 'filename', 'mime', 'expires', 'delete'}
+_tokens = {}   # path -> token
+
+# ─── 1) Published files ───────────────────────────────────────────────────────────
+def _expire(now: float):
+    for token, entry in [item for item in _files.items() if item[1]['expires'] <= now]:
+        del _files[token]
+        _tokens.pop(entry['path'], None)
+        if entry['delete']:
+            _remove(entry['path'])
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def publish(path: str, filename: str = None, mime: str = 'application/octet-stream',
+            delete: bool = False) -> str:
+    """
+    Token under which `path` is served as an attachment named `filename`.
+    Publishing the same path again keeps its token and extends it. With
+    `delete`, the file is removed once the token expires (or at exit).
+    """
+    path = os.path.abspath(path)
+    now = time.monotonic()
+    with _lock:
+        _expire(now)
+        token = _tokens.get(path) or secrets.token_urlsafe(24)
+        _tokens[path] = token
+        _files[token] = {
+            'path': path, 'filename': filename or os.path.basename(path),
+            'mime': mime, 'expires': now + DOWNLOAD_TTL_S, 'delete': delete,
+        }
+    return token
+
+def lookup(token: str):
+    """The published entry for `token`, or None if unknown or expired."""
+    with _lock:
+        _expire(time.monotonic())
+        return _files.get(token)
+
+def download_url(token: str, host: str = None) -> str:
+    """
+    Link to a published file: under HDD_DOWNLOAD_URL if set, else on the
+    route's port of `host` (the page's Host header, e.g. 'example.org:8501').
+    """
+    if DOWNLOAD_URL:
+        return f"{DOWNLOAD_URL.rstrip('/')}/{token}"
+    hostname = urlsplit(f"//{host or 'localhost'}").hostname or 'localhost'
+    if ':' in hostname:  # IPv6
+        hostname = f"[{hostname}]"
+    return f"http://{hostname}:{DOWNLOAD_PORT}/{token}"
+
+@atexit.register
+def _remove_temporary():
+    with _lock:
+        for entry in _files.values():
+            if entry['delete']:
+                _remove(entry['path'])
+
+# ─── 2) HTTP route ────────────────────────────────────────────────────────────────
+class _DownloadHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        entry = lookup(self.path.lstrip('/').split('?', 1)[0])
+        if entry is None:
+            self.send_error(404, "Link expired; go back to the app for a new one")
+            return
+        try:
+            f = open(entry['path'], 'rb')
+        except FileNotFoundError:
+            self.send_error(404, "File no longer exists")
+            return
+        with f:
+            filename = entry['filename']
+            fallback = filename.encode('ascii', 'replace').decode().replace('"', '')
+            self.send_response(200)
+            self.send_header('Content-Type', entry['mime'])
+            self.send_header('Content-Length', str(os.fstat(f.fileno()).st_size))
+            self.send_header('Content-Disposition', f"attachment; filename=\"{fallback}\"; "
+                                                    f"filename*=UTF-8''{quote(filename)}")
+            self.send_header('Cache-Control', 'no-store')
+            self.send_header('X-Content-Type-Options', 'nosniff')
+            self.end_headers()
+            try:
+                shutil.copyfileobj(f, self.wfile, CHUNK_BYTES)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the browser cancelled the download
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_downloads(port: int = DOWNLOAD_PORT, host: str = DOWNLOAD_HOST) -> ThreadingHTTPServer:
+    """Serves published files from a daemon thread; returns the server."""
+    server = ThreadingHTTPServer((host, port), _DownloadHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='downloads-http', daemon=True).start()
+    return server
+
+def start_downloads(port: int = None) -> bool:
+    """
+    Starts the route unless the port is 0. Returns whether links will work;
+    call once per process.
+    """
+    port = DOWNLOAD_PORT if port is None else port
+    if not port:
+        return False
+    try:
+        serve_downloads(port)
+    except OSError as e:  # e.g. a second app process on the same host
+        log.warning("Download route not started on port %d: %s", port, e)
+        return False
+    log.info("Downloads on port %d", port)
+    return True
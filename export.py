@@ -0,0 +1,178 @@
+# export.py
+#
+# Columnar export of the submissions table for analytics:
+#
+#   python export.py                    # new rows since the last export -> exports/parquet/
+#   python export.py --format arrow     # Arrow IPC instead (memory-mapped, zero-copy loads)
+#   python export.py --full             # start over from the first row
+#
+# Rows are streamed from SQLite in row_id order, CHUNK_ROWS at a time, and
+# written as a hive-partitioned dataset (day=YYYYMMDD/, from the patient ID
+# prefix). The highest exported row_id is kept as a watermark in the
+# export_watermarks table, so each run only exports rows added since.
+#
+# Requires pyarrow (imported only here).
+
+import argparse
+import os
+import shutil
+from datetime import datetime
+
+from db import get_conn, init_db, transaction
+
+EXPORT_DIR = os.environ.get('HDD_EXPORT_DIR', 'exports')
+CHUNK_ROWS = 100_000
+FORMATS = ('parquet', 'arrow')
+SCHEMA_VERSION = 2  # bump when export_schema() changes; the next run starts over
+
+# ─── 1) Schema ────────────────────────────────────────────────────────────────────
+def _arrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+    except ImportError:
+        raise ImportError("Columnar export needs pyarrow: pip install pyarrow") from None
+    return pyarrow, pyarrow.dataset
+
+def export_schema():
+    """Arrow schema of an exported chunk (the `day` partition column comes last)."""
+    from scoring import FEATURE_COLS
+
+    pa, _ = _arrow()
+    return pa.schema(
+        [('row_id', pa.int64()), ('id', pa.string())]
+        + [(col, pa.float64()) for col in FEATURE_COLS]
+        + [('prediction', pa.int8()), ('probability', pa.float64()),
+           ('created_at', pa.timestamp('s')), ('created_by', pa.string()),
+           ('day', pa.string())]
+    )
+
+def _partitioning():
+    pa, ds = _arrow()
+    return ds.partitioning(pa.schema([('day', pa.string())]), flavor='hive')
+
+def dataset_dir(fmt: str = 'parquet', out_dir: str = EXPORT_DIR) -> str:
+    return os.path.join(out_dir, fmt)
+
+# ─── 2) Watermarks ────────────────────────────────────────────────────────────────
+def _watermark_name(fmt: str, out_dir: str) -> str:
+    return f"submissions.v{SCHEMA_VERSION}:{fmt}:{os.path.abspath(out_dir)}"
+
+def get_watermark(fmt: str = 'parquet', out_dir: str = EXPORT_DIR) -> int:
+    """The highest row_id already exported (0 if none)."""
+    row = get_conn().execute(
+        "SELECT last_rowid FROM export_watermarks WHERE name = ?",
+        (_watermark_name(fmt, out_dir),)
+    ).fetchone()
+    return row[0] if row else 0
+
+def _set_watermark(fmt: str, out_dir: str, last_rowid: int):
+    with transaction() as conn:
+        conn.execute("""
+            INSERT INTO export_watermarks (name, last_rowid, exported_at) VALUES (?, ?, ?)
+            ON CONFLICT (name) DO UPDATE SET
+                last_rowid = excluded.last_rowid, exported_at = excluded.exported_at
+        """, (_watermark_name(fmt, out_dir), last_rowid,
+              datetime.now().isoformat(timespec='seconds')))
+
+# ─── 3) Export ────────────────────────────────────────────────────────────────────
+def _chunks(after_rowid: int, chunk_rows: int):
+    """Yields (first_rowid, last_rowid, columns) for rows after `after_rowid`."""
+    from scoring import FEATURE_COLS
+
+    columns = ['row_id', 'id', *FEATURE_COLS,
+               'prediction', 'probability', 'created_at', 'created_by']
+    conn = get_conn()
+    while True:
+        rows = conn.execute(
+            f"SELECT {', '.join(columns)} FROM submissions "
+            f"WHERE row_id > ? ORDER BY row_id LIMIT ?", (after_rowid, chunk_rows)
+        ).fetchall()
+        if not rows:
+            return
+        yield rows[0][0], rows[-1][0], list(zip(*rows))
+        after_rowid = rows[-1][0]
+
+def export_submissions(fmt: str = 'parquet', out_dir: str = EXPORT_DIR,
+                       full: bool = False, chunk_rows: int = CHUNK_ROWS) -> dict:
+    """
+    Appends the rows added since the last export to the dataset under
+    out_dir/<fmt>/day=YYYYMMDD/. Returns {'rows', 'files', 'watermark'}.
+
+    Each chunk's files are named after its first row_id and the watermark
+    only advances once a chunk is written, so an interrupted export simply
+    rewrites the same files on the next run. Without a watermark for the
+    current SCHEMA_VERSION the dataset is rebuilt from scratch.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {FORMATS}")
+    pa, ds = _arrow()
+    import pyarrow.compute as pc
+
+    target = dataset_dir(fmt, out_dir)
+    watermark = 0 if full else get_watermark(fmt, out_dir)
+    if watermark == 0:
+        shutil.rmtree(target, ignore_errors=True)
+        _set_watermark(fmt, out_dir, 0)
+    schema = export_schema()
+    total, files = 0, 0
+
+    for first, last, columns in _chunks(watermark, chunk_rows):
+        arrays = [pa.array(values, type=field.type)
+                  for values, field in zip(columns, schema)]
+        arrays.append(pc.utf8_slice_codeunits(arrays[1], 0, 8))  # day = ID's YYYYMMDD
+        table = pa.Table.from_arrays(arrays, schema=schema)
+        written = []
+        ds.write_dataset(
+            table, target,
+            format='parquet' if fmt == 'parquet' else 'ipc',
+            partitioning=_partitioning(),
+            # One per day in the chunk: the default cap of 1024 fails a
+            # backfill spanning years, and a chunk can't have more days than rows
+            max_partitions=max(chunk_rows, 1024),
+            basename_template=f"part-{first:012d}-{{i}}.{fmt}",
+            existing_data_behavior='overwrite_or_ignore',
+            file_visitor=written.append,
+        )
+        _set_watermark(fmt, out_dir, last)
+        total += table.num_rows
+        files += len(written)
+        watermark = last
+
+    return {'rows': total, 'files': files, 'watermark': watermark}
+
+# ─── 4) Loading ───────────────────────────────────────────────────────────────────
+def load_submissions(fmt: str = 'parquet', out_dir: str = EXPORT_DIR, columns=None,
+                     filter=None):
+    """
+    Reads the exported dataset back as a pyarrow Table (call .to_pandas()
+    for a DataFrame). Arrow IPC files are memory-mapped, so loading them is
+    zero-copy (a `filter` still copies the rows it keeps); `columns` and
+    `filter` (e.g. pyarrow.dataset.field('day') >= '20250601') are pushed
+    down so only the needed files and columns are read.
+    """
+    _, ds = _arrow()
+    import pyarrow.fs
+    dataset = ds.dataset(
+        dataset_dir(fmt, out_dir),
+        format='parquet' if fmt == 'parquet' else 'ipc',
+        partitioning=_partitioning(),
+        filesystem=pyarrow.fs.LocalFileSystem(use_mmap=fmt == 'arrow'),
+    )
+    return dataset.to_table(columns=columns, filter=filter)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export submissions for analytics")
+    parser.add_argument('--format', choices=FORMATS, default='parquet')
+    parser.add_argument('--out', default=EXPORT_DIR, help="export root directory")
+    parser.add_argument('--full', action='store_true',
+                        help="discard the previous export and start from the first row")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    args = parser.parse_args(argv)
+    init_db()
+    result = export_submissions(args.format, args.out, args.full, args.chunk_rows)
+    print(f"Exported {result['rows']} rows in {result['files']} files to "
+          f"{dataset_dir(args.format, args.out)} (watermark: row_id {result['watermark']})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# export_model.py
+#
+# Extracts coef_/intercept_ from the pickled scikit-learn LogisticRegression
+# into the small versioned array file read by scoring.LinearScorer, then
+# checks the two agree:
+#
+#   python export_model.py                      # heart_disease_model.sav -> .npz
+#   python export_model.py --check-only         # parity check of an existing export
+
+import argparse
+import pickle
+import sys
+
+import numpy as np
+import pandas as pd
+
+from scoring import FEATURE_COLS, MODEL_FILE, LinearScorer, model_digest
+
+# Ranges for the parity-check inputs: deliberately wider than the training
+# data (scoring.FEATURE_RANGES), so the check also covers unusual patients.
+PARITY_RANGES = {
+    'age': (20, 90), 'sex': (0, 1), 'cp': (0, 3), 'trestbps': (80, 220),
+    'chol': (100, 600), 'fbs': (0, 1), 'restecg': (0, 2), 'thalach': (60, 220),
+    'exang': (0, 1), 'oldpeak': (0, 7), 'slope': (0, 2), 'ca': (0, 4), 'thal': (0, 3),
+}
+
+def export(model, raw: bytes, out_path: str) -> LinearScorer:
+    """Writes the LogisticRegression weights to out_path and returns the scorer."""
+    if list(getattr(model, 'feature_names_in_', FEATURE_COLS)) != FEATURE_COLS:
+        raise ValueError("Model was not trained on FEATURE_COLS in order.")
+    if model.coef_.shape != (1, len(FEATURE_COLS)):
+        raise ValueError(f"Expected a binary model over 13 features, got coef_ {model.coef_.shape}")
+    scorer = LinearScorer(model.coef_[0], model.intercept_[0], model.classes_, model_digest(raw))
+    scorer.save(out_path)
+    return scorer
+
+def parity_check(model, scorer: LinearScorer, n: int = 100_000, seed: int = 0) -> float:
+    """
+    Compares the scorer against sklearn on n random patients (plus the
+    single-row API on a sample). Raises ValueError on any mismatch;
+    returns the largest probability difference.
+    """
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.uniform(lo, hi, n) if col == 'oldpeak' else rng.integers(lo, hi + 1, n)
+        for col, (lo, hi) in PARITY_RANGES.items()
+    ]).astype(np.float64)
+    frame = pd.DataFrame(X, columns=FEATURE_COLS)
+
+    # Explicit checks rather than assert, which `python -O` would strip
+    expected = model.predict(frame)
+    if not np.array_equal(scorer.predict(X), expected):
+        raise ValueError("batch predictions differ")
+    proba_diff = np.abs(scorer.predict_proba(X) - model.predict_proba(frame)).max()
+    if not proba_diff < 1e-9:
+        raise ValueError(f"batch probabilities differ by {proba_diff}")
+
+    for row, want in zip(X[:1000].tolist(), expected[:1000]):
+        if scorer.predict_one(row) != want:
+            raise ValueError(f"single-row prediction differs for {row}")
+    return float(proba_diff)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the model for LinearScorer")
+    parser.add_argument('--model', default=MODEL_FILE)
+    parser.add_argument('--out', default=None, help="defaults to the model path with .npz")
+    parser.add_argument('--check-only', action='store_true',
+                        help="verify an existing export instead of writing one")
+    args = parser.parse_args(argv)
+    out_path = args.out or args.model.rsplit('.', 1)[0] + '.npz'
+
+    with open(args.model, 'rb') as f:
+        raw = f.read()
+    model = pickle.loads(raw)
+
+    if args.check_only:
+        scorer = LinearScorer.load(out_path)
+        if scorer.version != model_digest(raw):
+            sys.exit(f"❌ {out_path} was exported from a different model file.")
+    else:
+        scorer = export(model, raw, out_path)
+        print(f"✅ Wrote {out_path} (model version {scorer.version})")
+
+    try:
+        diff = parity_check(model, scorer)
+    except ValueError as e:
+        sys.exit(f"❌ Parity check failed: {e}")
+    print(f"✅ Parity with scikit-learn OK (max probability difference {diff:.2e})")
+
+if __name__ == '__main__':
+    main()
@@ -71,25 +71,9 @@
 # forgot_password.py
 
 import streamlit as st
-import bcrypt
-import sqlite3
-
-DB_FILE = 'submissions.db'
-
-def load_user(username: str):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT username FROM users WHERE username = ?", (username,))
-    row = cursor.fetchone()
-    conn.close()
-    return row  # either a tuple or None
-
-def update_password(username: str, hashed_pw: str):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("UPDATE users SET password = ? WHERE username = ?", (hashed_pw, username))
-    conn.commit()
-    conn.close()
+
+from auth import AuthBusy, hash_password
+from users import get_user, update_password
 
 def forgot_password_page():
     st.markdown("""
@@ -118,15 +102,18 @@ def forgot_password_page():
         if not username or not new_password:
             st.error("❌ All fields are required.")
         else:
-            row = load_user(username)
-            if row is None:
+            if get_user(username) is None:
                 st.error("❌ Username not found.")
             elif new_password != confirm_pw:
                 st.error("❌ Passwords do not match.")
             else:
-                hashed_pw = bcrypt.hashpw(new_password.encode(), bcrypt.gensalt()).decode()
-                update_password(username, hashed_pw)
-                st.success("🎉 Password has been reset successfully! Please login with your new password.")
+                try:
+                    hashed_pw = hash_password(new_password)
+                except AuthBusy as e:
+                    st.error(f"⏳ {e}")
+                else:
+                    update_password(username, hashed_pw)
+                    st.success("🎉 Password has been reset successfully! Please login with your new password.")
 
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -0,0 +1,229 @@
+# hdd.py
+#
+# The app's core workflow as a plain Python API, free of Streamlit: score a
+# patient, build and save the submission, and run a whole Bulk Reports CSV.
+# The Detection page, the job worker and the command line all go through it:
+#
+#   python hdd.py bulk input.csv -o out.zip                 # one PDF per patient
+#   python hdd.py bulk input.csv -o out.pdf --use-model     # one combined PDF
+#   python hdd.py predict 63 1 3 145 233 1 0 150 0 2.3 0 0 1 --pdf report.pdf
+#
+# `bulk` streams the CSV chunk by chunk in this process, with no job queue
+# or browser session, so it suits cron; it exits non-zero on bad input.
+
+import argparse
+import os
+import sys
+import time
+
+from db import init_db
+
+# ─── 1) One patient ───────────────────────────────────────────────────────────────
+def assess(model, values, patient_id: str = None, created_by: str = None,
+           cache=None, save: bool = True) -> dict:
+    """
+    Scores one patient's 13 field values (strings or numbers, in FEATURE_COLS
+    order; raises ValueError if any isn't numeric) and returns the submission
+    dict, with the model's prediction and probability and its report body
+    attached, ready for reports.generate_pdf().
+
+    A patient ID is reserved unless given, and the submission is saved
+    unless save=False. Results come from `cache` (default: the process's
+    shared ResultCache) when the same features were scored by the same model.
+    """
+    from cache import CachedResult, result_key, shared_cache
+    from db import generate_patient_id, save_submission_db
+    from reports import BODY_KEY, report_template
+    from scoring import FEATURE_COLS, diagnosis_text, model_version, parse_features, score_one
+
+    inputs = parse_features(values)
+    cache = shared_cache() if cache is None else cache
+    key = result_key(inputs, model_version(model))
+    cached = cache.get(key)
+    pred, prob = (cached.prediction, cached.probability) if cached else score_one(model, inputs)
+
+    # The report shows the parsed values, as stored, so cached bodies match
+    submission = {
+        'id'         : patient_id or generate_patient_id(),
+        **dict(zip(FEATURE_COLS, inputs)),
+        'diagnosis'  : diagnosis_text(pred),
+        'prediction' : pred,
+        'probability': prob,
+        'created_by' : created_by,
+    }
+    if save:
+        save_submission_db(submission)
+    if cached is None:
+        cached = CachedResult(pred, report_template().fill(submission), prob)
+        cache.put(key, cached)
+    submission[BODY_KEY] = cached.body
+    return submission
+
+# ─── 2) Bulk building blocks ──────────────────────────────────────────────────────
+def score_chunk(chunk, model=None, use_model: bool = False, ids=None):
+    """
+    Turns a Bulk Reports CSV chunk into a DataFrame of submissions (id, the
+    13 features, diagnosis and prediction, plus the model's probability
+    whenever a model is given, from the same call, even when the diagnosis
+    comes from the CSV's target). IDs are reserved unless given.
+    """
+    from db import reserve_patient_ids
+    from scoring import FEATURE_COLS, diagnosis_texts, score_frame_proba
+
+    preds, probs = score_frame_proba(chunk, model, use_model=use_model)
+    subs_df = chunk[FEATURE_COLS].assign(
+        id=ids if ids is not None else reserve_patient_ids(len(chunk)),
+        diagnosis=diagnosis_texts(preds),
+        prediction=preds
+    )
+    if probs is not None:
+        subs_df['probability'] = probs
+    return subs_df
+
+def attach_report_bodies(submissions: list, features: list, preds, version: str = '',
+                         from_target: bool = False, cache=None):
+    """
+    Sets each submission's report body from the result cache, filling and
+    caching the ones it misses. Predictions come from the model `version`,
+    or from the CSV's target column if from_target (the risk shown is still
+    that model's).
+    """
+    from cache import CachedResult, result_key, shared_cache
+    from reports import BODY_KEY, report_template
+
+    cache = shared_cache() if cache is None else cache
+    template = report_template()
+    for sub, row, pred in zip(submissions, features, preds.tolist()):
+        key = result_key(row, f"target={pred}:{version}" if from_target else version)
+        cached = cache.get(key)
+        if cached is None:
+            cached = CachedResult(pred, template.fill(sub), sub.get('probability'))
+            cache.put(key, cached)
+        sub[BODY_KEY] = cached.body
+
+def chunk_submissions(subs_df, use_model: bool = False, model=None) -> list:
+    """A scored chunk as submission dicts with report bodies, ready to render."""
+    from scoring import FEATURE_COLS, model_version
+
+    submissions = subs_df.to_dict('records')
+    attach_report_bodies(submissions, subs_df[FEATURE_COLS].to_numpy().tolist(),
+                         subs_df['prediction'].to_numpy(), model_version(model),
+                         from_target=not use_model)
+    return submissions
+
+# ─── 3) Whole CSV ─────────────────────────────────────────────────────────────────
+def run_bulk(csv_path: str, out_path: str, use_model: bool = False,
+             combined: bool = False, workers: int = 1, deflate: bool = False,
+             chunk_rows: int = None, save: bool = True, created_by: str = None,
+             model=None) -> int:
+    """
+    Generates the reports for every row of a Bulk Reports CSV into `out_path`
+    (a ZIP of PDFs, or one combined PDF) and, unless save=False, saves the
+    submissions. The output appears atomically once complete. Returns the
+    number of reports; raises ValueError if the CSV lacks required columns
+    or has a row that can't be scored, before anything is saved.
+    """
+    import zipfile
+    from contextlib import closing
+    from bulk import DEFAULT_CHUNK_ROWS, missing_columns, read_csv_chunks, validate_csv
+    from db import save_submissions_bulk
+    from reports import CombinedReport, ReportArchive
+    from scoring import load_model
+
+    if model is None:
+        model = load_model()  # also gives the risk when diagnosing from target
+    tmp_path = out_path + '.tmp'
+    with open(csv_path, 'rb') as src:
+        missing = missing_columns(src)
+        if missing:
+            raise ValueError(f"CSV is missing required columns: {missing}")
+        # Chunks are saved as they're rendered, so a bad line near the end
+        # would otherwise leave the earlier rows saved (and a rerun would
+        # save them again)
+        validate_csv(src, use_model, chunk_rows or DEFAULT_CHUNK_ROWS)
+        try:
+            with open(tmp_path, 'wb') as out:
+                if combined:
+                    writer = CombinedReport(fileobj=out)
+                else:
+                    compression = zipfile.ZIP_DEFLATED if deflate else zipfile.ZIP_STORED
+                    writer = ReportArchive(workers=workers, compression=compression,
+                                           fileobj=out)
+                chunks = read_csv_chunks(src, chunk_rows or DEFAULT_CHUNK_ROWS)
+                with writer, closing(chunks):
+                    for chunk in chunks:
+                        subs_df = score_chunk(chunk, model, use_model)
+                        writer.add(chunk_submissions(subs_df, use_model, model))
+                        if save:
+                            save_submissions_bulk(subs_df, created_by=created_by)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, out_path)
+    return writer.count
+
+# ─── 4) Command line ──────────────────────────────────────────────────────────────
+def _bulk_command(args):
+    combined = args.combined or args.output.lower().endswith('.pdf')
+    start = time.perf_counter()
+    try:
+        count = run_bulk(args.csv, args.output, use_model=args.use_model,
+                         combined=combined, workers=args.workers, deflate=args.deflate,
+                         chunk_rows=args.chunk_rows, save=not args.no_save,
+                         created_by=args.user)
+    except ValueError as e:
+        sys.exit(f"error: {e}")
+    print(f"Wrote {count} reports to {args.output} in {time.perf_counter() - start:.1f}s")
+
+def _predict_command(args):
+    from reports import generate_pdf
+    from scoring import load_model
+
+    try:
+        submission = assess(load_model(), args.values, created_by=args.user,
+                            save=not args.no_save)
+    except ValueError as e:
+        sys.exit(f"error: {e}")
+    print(f"{submission['id']}: {submission['diagnosis']}")
+    if args.pdf:
+        with open(args.pdf, 'wb') as f:
+            f.write(generate_pdf(submission).getvalue())
+
+def main(argv=None):
+    from reports import default_pdf_workers
+
+    parser = argparse.ArgumentParser(prog='hdd', description="Heart disease detection core")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    bulk = commands.add_parser('bulk', help="generate reports for every row of a CSV")
+    bulk.add_argument('csv', help="CSV with the 13 feature columns and target")
+    bulk.add_argument('-o', '--output', required=True,
+                      help="output .zip (one PDF per patient) or .pdf (combined)")
+    bulk.add_argument('--combined', action='store_true',
+                      help="one combined PDF even if the output isn't named .pdf")
+    bulk.add_argument('--use-model', action='store_true',
+                      help="diagnose with the model instead of the CSV's target")
+    bulk.add_argument('--workers', type=int, default=default_pdf_workers(),
+                      help="PDF render processes for ZIP output")
+    bulk.add_argument('--deflate', action='store_true', help="deflate the ZIP entries")
+    bulk.add_argument('--chunk-rows', type=int, help="CSV rows per chunk")
+    bulk.add_argument('--no-save', action='store_true',
+                      help="don't store the submissions in the database")
+    bulk.add_argument('--user', help="username recorded as created_by")
+    bulk.set_defaults(run=_bulk_command)
+
+    predict = commands.add_parser('predict', help="diagnose one patient")
+    predict.add_argument('values', nargs=13, metavar='VALUE',
+                         help="the 13 features, in FEATURE_COLS order")
+    predict.add_argument('--pdf', help="also write the report to this file")
+    predict.add_argument('--no-save', action='store_true',
+                         help="don't store the submission in the database")
+    predict.add_argument('--user', help="username recorded as created_by")
+    predict.set_defaults(run=_predict_command)
+
+    args = parser.parse_args(argv)
+    init_db()
+    args.run(args)
+
+if __name__ == '__main__':
+    main()
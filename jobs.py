@@ -0,0 +1,298 @@
+# jobs.py
+#
+# Background bulk-report jobs. The Bulk Reports page only queues a job (the
+# uploaded CSV is copied into JOBS_DIR); a worker process does the work and
+# the page polls its progress:
+#
+#   python jobs.py            # run a worker until interrupted
+#   python jobs.py --once     # finish whatever is queued, then exit
+#
+# The app starts one worker of its own (resources.ensure_job_worker).
+# Each CSV chunk is scored, rendered and saved, and its checkpoint is
+# committed in the same transaction as its DB rows, so a job interrupted by
+# a browser disconnect, rerun or restart resumes after its last finished
+# chunk without duplicating rows.
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import time
+import zipfile
+from contextlib import closing
+from datetime import datetime
+
+from db import get_conn, init_db, save_submissions_bulk, transaction
+from metrics import start_exporters, timed
+
+JOBS_DIR = os.environ.get('HDD_JOBS_DIR', 'jobs')
+INPUT_NAME = 'input.csv'
+
+# A running job is handed to the next free worker once its worker process is
+# gone, or (e.g. after a hang or PID reuse) if it has not checkpointed a
+# chunk for this long.
+STALE_AFTER_S = 600
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+ACTIVE = (QUEUED, RUNNING)
+
+log = logging.getLogger('hdd.jobs')
+
+# ─── 1) Queue ─────────────────────────────────────────────────────────────────────
+def job_dir(job_id: int) -> str:
+    return os.path.join(JOBS_DIR, str(job_id))
+
+def submit_bulk_job(fileobj, input_name: str = None, total_rows: int = 0,
+                    use_model: bool = False, combined: bool = False,
+                    deflate: bool = False, workers: int = 1,
+                    chunk_rows: int = None, created_by: str = None) -> int:
+    """
+    Queues a Bulk Reports job for the CSV in `fileobj` and returns its ID.
+    The CSV is copied into the job's directory before the job is visible;
+    the rows it saves are attributed to `created_by`.
+    """
+    from bulk import DEFAULT_CHUNK_ROWS
+
+    params = {
+        'use_model' : bool(use_model),
+        'combined'  : bool(combined),
+        'deflate'   : bool(deflate),
+        'workers'   : int(workers),
+        'chunk_rows': int(chunk_rows or DEFAULT_CHUNK_ROWS),
+    }
+    with transaction(immediate=True) as conn:
+        job_id = conn.execute("""
+            INSERT INTO jobs (kind, status, params, input_name, total_rows, created_at,
+                              created_by)
+            VALUES ('bulk_reports', ?, ?, ?, ?, ?, ?)
+        """, (QUEUED, json.dumps(params), input_name, int(total_rows),
+              datetime.now().isoformat(timespec='seconds'), created_by)).lastrowid
+        os.makedirs(job_dir(job_id), exist_ok=True)
+        fileobj.seek(0)
+        with open(os.path.join(job_dir(job_id), INPUT_NAME), 'wb') as f:
+            shutil.copyfileobj(fileobj, f)
+    return job_id
+
+def _job_dict(cursor, row) -> dict:
+    return {col[0]: value for col, value in zip(cursor.description, row)}
+
+def get_job(job_id: int) -> dict:
+    """Returns the job's row as a dict, or None."""
+    cur = get_conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+    row = cur.fetchone()
+    return _job_dict(cur, row) if row else None
+
+def list_jobs(limit: int = 20) -> list:
+    """The most recent jobs, newest first."""
+    cur = get_conn().execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,))
+    return [_job_dict(cur, row) for row in cur.fetchall()]
+
+def retry_job(job_id: int):
+    """Re-queues a failed job; it resumes from its last checkpoint."""
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, error = NULL WHERE id = ? AND status = ?",
+            (QUEUED, job_id, FAILED)
+        )
+
+def delete_job(job_id: int):
+    """Removes a finished or failed job and its files (the saved DB rows stay)."""
+    with transaction() as conn:
+        deleted = conn.execute(
+            "DELETE FROM jobs WHERE id = ? AND status IN (?, ?)", (job_id, DONE, FAILED)
+        ).rowcount
+    if deleted:
+        shutil.rmtree(job_dir(job_id), ignore_errors=True)
+
+# ─── 2) Claiming ──────────────────────────────────────────────────────────────────
+def _pid_alive(pid) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def claim_job() -> dict:
+    """
+    Atomically takes the oldest queued job (or a stale running one) for this
+    process and marks it running. Returns the job, or None if there is none.
+    """
+    now = time.time()
+    with transaction(immediate=True) as conn:
+        cur = conn.execute(
+            "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY id", ACTIVE
+        )
+        for row in cur.fetchall():
+            job = _job_dict(cur, row)
+            if job['status'] == RUNNING and _pid_alive(job['worker_pid']) and \
+                    now - (job['heartbeat'] or 0) < STALE_AFTER_S:
+                continue
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker_pid = ?, heartbeat = ? WHERE id = ?",
+                (RUNNING, os.getpid(), now, job['id'])
+            )
+            return get_job(job['id'])
+    return None
+
+# ─── 3) Running a job ─────────────────────────────────────────────────────────────
+def _part_path(job_id: int, chunk: int) -> str:
+    return os.path.join(job_dir(job_id), f"part_{chunk:05d}.zip")
+
+@timed('job_chunk', "Scoring, rendering and saving one bulk-job chunk")
+def _run_chunk(job: dict, params: dict, chunk_index: int, chunk, model, pool):
+    """Scores, renders and saves one CSV chunk, then checkpoints it."""
+    from hdd import chunk_submissions, score_chunk
+    from reports import ReportArchive
+
+    subs_df = score_chunk(chunk, model, params['use_model'])
+
+    # ZIP jobs render each chunk into its own part file (written under a temp
+    # name, so a half-written part is never mistaken for a finished one).
+    # Combined PDFs are rendered from the saved rows at the end instead.
+    if not params['combined']:
+        submissions = chunk_submissions(subs_df, params['use_model'], model)
+
+        part = _part_path(job['id'], chunk_index)
+        compression = zipfile.ZIP_DEFLATED if params['deflate'] else zipfile.ZIP_STORED
+        with open(part + '.tmp', 'wb') as f, ReportArchive(
+            workers=params['workers'], compression=compression, fileobj=f, pool=pool
+        ) as archive:
+            archive.add(submissions)
+        os.replace(part + '.tmp', part)
+
+    with transaction(immediate=True) as conn:
+        save_submissions_bulk(subs_df, created_by=job.get('created_by'))
+        last_rowid = conn.execute("SELECT MAX(row_id) FROM submissions").fetchone()[0]
+        conn.execute("""
+            INSERT OR REPLACE INTO job_chunks (job_id, chunk, rows, first_rowid, last_rowid)
+            VALUES (?, ?, ?, ?, ?)
+        """, (job['id'], chunk_index, len(subs_df), last_rowid - len(subs_df) + 1, last_rowid))
+        conn.execute("""
+            UPDATE jobs SET chunks_done = ?, rows_done = rows_done + ?, heartbeat = ?
+            WHERE id = ?
+        """, (chunk_index + 1, len(subs_df), time.time(), job['id']))
+
+def _job_submissions(job_id: int):
+    """Yields the job's saved submissions as dicts, in CSV order."""
+    from scoring import FEATURE_COLS, diagnosis_text
+
+    conn = get_conn()
+    ranges = conn.execute(
+        "SELECT first_rowid, last_rowid FROM job_chunks WHERE job_id = ? ORDER BY chunk",
+        (job_id,)
+    ).fetchall()
+    columns = ['id', *FEATURE_COLS, 'prediction', 'probability']
+    for first, last in ranges:
+        rows = conn.execute(
+            f"SELECT {', '.join(columns)} FROM submissions "
+            f"WHERE row_id BETWEEN ? AND ? ORDER BY row_id", (first, last)
+        ).fetchall()
+        for row in rows:
+            sub = dict(zip(columns, row))
+            sub['diagnosis'] = diagnosis_text(sub.pop('prediction'))
+            yield sub
+
+def _write_output(job: dict, params: dict) -> str:
+    """Assembles the finished artifact from the checkpoints; returns its path."""
+    from reports import CombinedReport
+
+    directory = job_dir(job['id'])
+    if params['combined']:
+        path = os.path.join(directory, 'bulk_reports.pdf')
+        with open(path + '.tmp', 'wb') as f, CombinedReport(fileobj=f) as report:
+            report.add(_job_submissions(job['id']))
+    else:
+        path = os.path.join(directory, 'bulk_reports.zip')
+        with zipfile.ZipFile(path + '.tmp', 'w') as dest:
+            for chunk_index in range(job['chunks_done']):
+                with zipfile.ZipFile(_part_path(job['id'], chunk_index)) as part:
+                    for info in part.infolist():
+                        dest.writestr(info, part.read(info))
+    os.replace(path + '.tmp', path)
+    return path
+
+def run_job(job: dict):
+    """
+    Runs (or resumes) one claimed job to completion. Failures are recorded
+    on the job rather than raised.
+    """
+    from bulk import read_csv_chunks
+    from reports import make_pdf_pool
+    from scoring import load_model
+
+    params = json.loads(job['params'])
+    pool = None
+    try:
+        model = load_model()  # also gives the risk when diagnosing from target
+        if not params['combined'] and params['workers'] > 1:
+            pool = make_pdf_pool(params['workers'])
+
+        skip = job['rows_done']
+        with open(os.path.join(job_dir(job['id']), INPUT_NAME), 'rb') as f, \
+                closing(read_csv_chunks(f, params['chunk_rows'], skip_rows=skip)) as chunks:
+            for chunk_index, chunk in enumerate(chunks, start=job['chunks_done']):
+                _run_chunk(job, params, chunk_index, chunk, model, pool)
+        job = get_job(job['id'])
+        output = _write_output(job, params)
+    except Exception as e:
+        log.exception("Job %s failed", job['id'])
+        with transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ? WHERE id = ?",
+                (FAILED, f"{type(e).__name__}: {e}", job['id'])
+            )
+        return
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, output_path = ?, finished_at = ? WHERE id = ?",
+            (DONE, output, datetime.now().isoformat(timespec='seconds'), job['id'])
+        )
+    from cache import shared_cache
+    log.info("Job %s done; result cache: %s", job['id'], shared_cache().stats())
+    # The artifact is complete; the input and part files are no longer needed.
+    for name in os.listdir(job_dir(job['id'])):
+        if name == INPUT_NAME or name.startswith('part_'):
+            os.remove(os.path.join(job_dir(job['id']), name))
+
+# ─── 4) Worker loop ───────────────────────────────────────────────────────────────
+def run_worker(poll_interval: float = 1.0, once: bool = False, parent_pid: int = None):
+    """
+    Claims and runs jobs until interrupted. With once=True it returns when
+    the queue is empty; with parent_pid it exits once that process is gone.
+    """
+    init_db()
+    while True:
+        job = claim_job()
+        if job is not None:
+            log.info("Running job %s", job['id'])
+            run_job(job)
+            continue
+        if once or (parent_pid and not _pid_alive(parent_pid)):
+            return
+        time.sleep(poll_interval)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk report job worker")
+    parser.add_argument('--once', action='store_true',
+                        help="exit when the queue is empty")
+    parser.add_argument('--poll', type=float, default=1.0,
+                        help="seconds between queue checks")
+    parser.add_argument('--parent-pid', type=int,
+                        help="exit when this process exits")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    # The app process owns the metrics port; workers only dump JSON if configured
+    start_exporters(port=0)
+    run_worker(args.poll, args.once, args.parent_pid)
+
+if __name__ == '__main__':
+    main()
@@ -71,23 +71,48 @@
 
 # login.py
 
+import math
+import os
+
 import streamlit as st
-import bcrypt
-import sqlite3
 
-DB_FILE = 'submissions.db'
+from auth import (
+    AuthBusy, hash_password, login_limits, needs_rehash, throttle, verify_password
+)
+from metrics import counter
+from resources import load_asset
+from users import get_user, start_session, update_password
 
-def load_user(username: str):
-    """Return (username, name, password_hash) or None."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT username, name, password FROM users WHERE username = ?", (username,))
-    row = cursor.fetchone()
-    conn.close()
-    return row
+# Reverse proxies in front of the app, each appending the address it saw to
+# X-Forwarded-For. The client is the entry added by the outermost one; any
+# entries left of it were sent by the client and can't be trusted. The
+# default 0 means the app is reached directly: forwarding headers are ignored
+# and the socket peer is used. Behind nginx, set HDD_TRUSTED_PROXIES=1.
+TRUSTED_PROXIES = int(os.environ.get('HDD_TRUSTED_PROXIES', '0'))
 
 def check_password(plain: str, hashed: str) -> bool:
-    return bcrypt.checkpw(plain.encode(), hashed.encode())
+    return verify_password(plain, hashed)
+
+def _socket_peer():
+    """Address of the browser's websocket connection, or None outside a session."""
+    from streamlit.runtime import Runtime, exists
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    if ctx is None or not exists():
+        return None
+    client = Runtime.instance().get_client(ctx.session_id)
+    ip = getattr(getattr(client, 'request', None), 'remote_ip', None)
+    return ip if isinstance(ip, str) and ip else None
+
+def client_ip(headers=None):
+    """The client's address as seen by the trusted proxies (or the socket), or None."""
+    if TRUSTED_PROXIES <= 0:
+        return _socket_peer()
+    headers = st.context.headers if headers is None else headers
+    hops = [hop.strip() for hop in headers.get('X-Forwarded-For', '').split(',') if hop.strip()]
+    if hops:
+        return hops[-min(TRUSTED_PROXIES, len(hops))]
+    return headers.get('X-Real-Ip') or _socket_peer()
 
 def login_page():
     st.markdown("""
@@ -106,7 +131,7 @@ def login_page():
         </style>
     """, unsafe_allow_html=True)
 
-    st.image("Heart.png", width=120)
+    st.image(load_asset("Heart.png"), width=120)
     st.markdown('<div class="login-box">', unsafe_allow_html=True)
 
     st.title("🩺 Doctor Login")
@@ -114,21 +139,43 @@ def login_page():
     password = st.text_input("🔒 Password", type="password", key="login_password")
 
     if st.button("Login"):
+        # Throttled users/IPs are refused before any bcrypt work is done
+        limits = login_limits(username, client_ip())
+        wait = throttle.retry_after(limits)
         if not username or not password:
             st.error("❌ Please enter both username and password.")
+        elif wait:
+            counter('login_throttled', "Logins refused by the throttle").inc()
+            st.error(f"❌ Too many failed attempts. Please try again in "
+                     f"{math.ceil(wait / 60)} min.")
         else:
-            row = load_user(username)
-            if row is None:
+            user = get_user(username)
+            if user is None:
+                counter('login_failures', "Failed logins").inc()
+                # Only the IP counts: guesses at made-up names mustn't fill the throttle
+                throttle.record_failure({k: v for k, v in limits.items() if k.startswith('ip:')})
                 st.error("❌ Username not found.")
             else:
-                _, name, hashed_pw = row
-                if check_password(password, hashed_pw):
-                    st.session_state.logged_in = True
-                    st.session_state.username = username
-                    st.session_state.full_name = name
-                    st.success(f"Welcome Dr. {name} 👋")
+                try:
+                    ok = check_password(password, user.password_hash)
+                except AuthBusy as e:
+                    st.error(f"⏳ {e}")
+                    st.stop()
+                if ok:
+                    counter('login_successes', "Successful logins").inc()
+                    throttle.reset(f"user:{username}")
+                    # Upgrade hashes made with another cost factor while we have the password
+                    if needs_rehash(user.password_hash):
+                        try:
+                            update_password(username, hash_password(password))
+                        except AuthBusy:
+                            pass  # try again on a later login
+                    start_session(user)
+                    st.success(f"Welcome Dr. {user.name} 👋")
                     # NO MORE st.experimental_rerun() here
                 else:
+                    counter('login_failures', "Failed logins").inc()
+                    throttle.record_failure(limits)
                     st.error("❌ Incorrect password.")
 
     st.markdown('</div>', unsafe_allow_html=True)
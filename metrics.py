@@ -0,0 +1,234 @@
+# metrics.py
+#
+# In-process timing and counters for the hot paths (model calls, patient IDs,
+# DB writes and queries, PDF rendering, bcrypt). Histograms use fixed
+# buckets, so recording is a bisect and two additions under a lock, and
+# p50/p95/p99 are estimated from the buckets the way Prometheus does.
+#
+# Exposed per process:
+#   HDD_METRICS_PORT=9464           Prometheus text on http://127.0.0.1:9464/metrics
+#                                   (and JSON on /metrics.json); 0 disables it
+#   HDD_METRICS_JSON=metrics-{pid}.json
+#                                   snapshot written every HDD_METRICS_DUMP_S
+#                                   seconds and at exit
+#
+# Stdlib only, so every module can import it without slowing start-up.
+
+import atexit
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = 'hdd_'
+METRICS_PORT = int(os.environ.get('HDD_METRICS_PORT', '9464'))
+METRICS_JSON = os.environ.get('HDD_METRICS_JSON')
+DUMP_INTERVAL_S = float(os.environ.get('HDD_METRICS_DUMP_S', '15'))
+
+# Upper bounds in seconds: 50 µs to ~52 s, doubling (p99 is within 2x).
+LATENCY_BUCKETS = tuple(0.00005 * 2 ** i for i in range(21))
+QUANTILES = (0.5, 0.95, 0.99)
+
+log = logging.getLogger('hdd.metrics')
+
+
+class Counter:
+    def __init__(self, name: str, help: str = ''):
+        self.name, self.help = name, help
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n: int = 1):
+        with self._lock:
+            self.value += n
+
+
+class Histogram:
+    """Latency histogram with cumulative-on-export buckets (seconds)."""
+
+    def __init__(self, name: str, help: str = '', buckets=LATENCY_BUCKETS):
+        self.name, self.help = name, help
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        i = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += seconds
+            if seconds > self._max:
+                self._max = seconds
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self) -> tuple:
+        """(per-bucket counts, sum, max), read consistently."""
+        with self._lock:
+            return list(self._counts), self._sum, self._max
+
+    def summary(self) -> dict:
+        counts, total, peak = self.snapshot()
+        n = sum(counts)
+        result = {'count': n, 'sum': total, 'mean': total / n if n else 0.0, 'max': peak}
+        for q in QUANTILES:
+            result[f"p{round(q * 100)}"] = _quantile(q, self.buckets, counts, peak)
+        return result
+
+
+def _quantile(q: float, bounds, counts, peak: float) -> float:
+    """Estimates quantile q by interpolating inside the bucket that holds it."""
+    n = sum(counts)
+    if not n:
+        return 0.0
+    rank, seen = q * n, 0
+    for i, c in enumerate(counts):
+        if c and seen + c >= rank:
+            lower = bounds[i - 1] if i else 0.0
+            upper = min(bounds[i] if i < len(bounds) else peak, peak)
+            return lower + (upper - lower) * (rank - seen) / c
+        seen += c
+    return peak
+
+# ─── 1) Registry ──────────────────────────────────────────────────────────────────
+_registry = {}
+_registry_lock = threading.Lock()
+
+def _get(cls, name: str, help: str):
+    metric = _registry.get(name)
+    if metric is None:
+        with _registry_lock:
+            metric = _registry.setdefault(name, cls(name, help))
+    return metric
+
+def counter(name: str, help: str = '') -> Counter:
+    """The process-wide counter `name` (created on first use)."""
+    return _get(Counter, name, help)
+
+def histogram(name: str, help: str = '') -> Histogram:
+    """The process-wide latency histogram `name` (created on first use)."""
+    return _get(Histogram, name, help)
+
+def timed(name: str, help: str = ''):
+    """Decorator recording each call's wall time in histogram `name`."""
+    hist = histogram(name, help)
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                hist.observe(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+# ─── 2) Exposition ────────────────────────────────────────────────────────────────
+def _fmt(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+def prometheus_text() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for name, metric in sorted(_registry.items()):
+        full = PREFIX + name
+        if isinstance(metric, Counter):
+            full += '_total'
+            lines += [f"# HELP {full} {metric.help or name}", f"# TYPE {full} counter",
+                      f"{full} {metric.value}"]
+            continue
+        full += '_seconds'
+        counts, total, _ = metric.snapshot()
+        lines += [f"# HELP {full} {metric.help or name}", f"# TYPE {full} histogram"]
+        cumulative = 0
+        for bound, c in zip(metric.buckets, counts):
+            cumulative += c
+            lines.append(f'{full}_bucket{{le="{bound:g}"}} {cumulative}')
+        cumulative += counts[-1]
+        lines += [f'{full}_bucket{{le="+Inf"}} {cumulative}',
+                  f"{full}_sum {_fmt(total)}", f"{full}_count {cumulative}"]
+    return '\n'.join(lines) + '\n'
+
+def snapshot() -> dict:
+    """All metrics as plain data: counters by value, histograms summarized."""
+    return {
+        'pid': os.getpid(),
+        'time': time.time(),
+        'counters': {name: m.value for name, m in sorted(_registry.items())
+                     if isinstance(m, Counter)},
+        'histograms': {name: m.summary() for name, m in sorted(_registry.items())
+                       if isinstance(m, Histogram)},
+    }
+
+def dump_json(path: str = None):
+    """Writes snapshot() to `path` ('{pid}' is replaced by the process ID)."""
+    path = (path or METRICS_JSON).replace('{pid}', str(os.getpid()))
+    with open(path + '.tmp', 'w') as f:
+        json.dump(snapshot(), f, indent=1)
+    os.replace(path + '.tmp', path)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/metrics':
+            body, ctype = prometheus_text().encode(), 'text/plain; version=0.0.4'
+        elif self.path == '/metrics.json':
+            body, ctype = json.dumps(snapshot()).encode(), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes would otherwise log to stderr every few seconds
+
+def serve_metrics(port: int = METRICS_PORT, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """Serves /metrics and /metrics.json from a daemon thread; returns the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+def _dump_loop(path: str, interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            dump_json(path)
+        except OSError as e:
+            log.warning("Could not write metrics to %s: %s", path, e)
+
+def start_exporters(port: int = None, json_path: str = None):
+    """
+    Starts this process's exporters as configured (arguments override the
+    HDD_METRICS_* environment): the HTTP endpoint unless the port is 0, and
+    the periodic JSON dump if a path is set. Call once per process.
+    """
+    port = METRICS_PORT if port is None else port
+    json_path = json_path or METRICS_JSON
+    if port:
+        try:
+            serve_metrics(port)
+            log.info("Metrics on http://127.0.0.1:%d/metrics", port)
+        except OSError as e:  # e.g. a second app process on the same host
+            log.warning("Metrics endpoint not started on port %d: %s", port, e)
+    if json_path:
+        atexit.register(dump_json, json_path)
+        threading.Thread(target=_dump_loop, args=(json_path, DUMP_INTERVAL_S),
+                         name='metrics-dump', daemon=True).start()
@@ -0,0 +1,246 @@
+# migrations.py
+#
+# Versioned schema migrations. The schema version lives in SQLite's
+# PRAGMA user_version; migrate() (run by db.init_db) applies every newer
+# step in order, each in its own write transaction, so whichever process
+# starts first upgrades the DB and the others find it done.
+#
+# A step may have a backfill: idempotent, resumable bulk work (e.g. copying
+# rows in batches) run before the step's transaction, so a large table is
+# converted without holding the write lock for the whole copy.
+
+import logging
+import sqlite3
+
+from db import get_conn, transaction
+
+log = logging.getLogger('hdd.migrations')
+
+MIGRATIONS = []  # (version, description, apply, backfill, vacuum)
+
+def migration(version: int, description: str, backfill=None, vacuum: bool = False):
+    """Registers `apply(conn)` as schema step `version`."""
+    def register(apply):
+        MIGRATIONS.append((version, description, apply, backfill, vacuum))
+        MIGRATIONS.sort(key=lambda step: step[0])
+        return apply
+    return register
+
+def schema_version(conn: sqlite3.Connection = None) -> int:
+    return (conn or get_conn()).execute("PRAGMA user_version").fetchone()[0]
+
+def migrate():
+    """Brings the database up to the latest schema version."""
+    vacuum = False
+    for version, description, apply, backfill, needs_vacuum in MIGRATIONS:
+        if schema_version() >= version:
+            continue
+        if backfill is not None:
+            backfill()
+        with transaction(immediate=True) as conn:
+            if schema_version(conn) >= version:
+                continue  # another process got there first
+            apply(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+        log.info("Migrated schema to v%d: %s", version, description)
+        vacuum = vacuum or needs_vacuum
+    if vacuum:
+        # Return the pages freed by rebuilt tables to the filesystem
+        try:
+            get_conn().execute("VACUUM")
+        except sqlite3.OperationalError as e:
+            log.warning("VACUUM skipped (%s); the file will shrink on a later VACUUM", e)
+
+# ─── v1) Baseline ─────────────────────────────────────────────────────────────────
+@migration(1, "Baseline schema")
+def _v1_baseline(conn):
+    # Users table:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            name     TEXT,
+            password TEXT
+        )
+    """)
+    # Submissions table:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS submissions (
+            id        TEXT PRIMARY KEY,
+            age       REAL,
+            sex       REAL,
+            cp        REAL,
+            trestbps  REAL,
+            chol      REAL,
+            fbs       REAL,
+            restecg   REAL,
+            thalach   REAL,
+            exang     REAL,
+            oldpeak   REAL,
+            slope     REAL,
+            ca        REAL,
+            thal      REAL,
+            diagnosis TEXT
+        )
+    """)
+    # Secondary indexes for the View Database filters (date ranges use the
+    # primary key, since IDs start with YYYYMMDD):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_submissions_diagnosis ON submissions (diagnosis)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_submissions_age ON submissions (age)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_submissions_chol ON submissions (chol)")
+    # Per-day patient ID sequences (see reserve_patient_ids):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS patient_id_seq (
+            day      TEXT PRIMARY KEY,
+            last_seq INTEGER NOT NULL
+        )
+    """)
+    # Background bulk-report jobs and their per-chunk checkpoints (see jobs.py):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id          INTEGER PRIMARY KEY,
+            kind        TEXT NOT NULL,
+            status      TEXT NOT NULL,
+            params      TEXT NOT NULL,
+            input_name  TEXT,
+            total_rows  INTEGER NOT NULL DEFAULT 0,
+            rows_done   INTEGER NOT NULL DEFAULT 0,
+            chunks_done INTEGER NOT NULL DEFAULT 0,
+            output_path TEXT,
+            error       TEXT,
+            worker_pid  INTEGER,
+            heartbeat   REAL,
+            created_at  TEXT NOT NULL,
+            finished_at TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS job_chunks (
+            job_id      INTEGER NOT NULL REFERENCES jobs (id) ON DELETE CASCADE,
+            chunk       INTEGER NOT NULL,
+            rows        INTEGER NOT NULL,
+            first_rowid INTEGER NOT NULL,
+            last_rowid  INTEGER NOT NULL,
+            PRIMARY KEY (job_id, chunk)
+        )
+    """)
+    # Columnar export progress (see export.py):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS export_watermarks (
+            name        TEXT PRIMARY KEY,
+            last_rowid  INTEGER NOT NULL,
+            exported_at TEXT
+        )
+    """)
+
+# ─── v2) Compact submissions ──────────────────────────────────────────────────────
+# Categorical features become INTEGER columns (stored in 0-1 bytes each; a
+# non-integral value is still kept exactly, as SQLite only converts
+# losslessly), the diagnosis sentence becomes a 0/1 prediction plus
+# probability, and rows record when and by whom they were created.
+# row_id keeps each row's old rowid, so keyset cursors, job checkpoints and
+# export watermarks stay valid.
+V2_COPY_BATCH = 50_000
+
+_V2_COLUMNS = (
+    "row_id, id, age, sex, cp, trestbps, chol, fbs, restecg, thalach, exang, "
+    "oldpeak, slope, ca, thal, prediction, probability, created_at, created_by"
+)
+
+def _v2_create(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS submissions_v2 (
+            row_id      INTEGER PRIMARY KEY,
+            id          TEXT NOT NULL UNIQUE,
+            age         REAL,
+            sex         INTEGER,
+            cp          INTEGER,
+            trestbps    REAL,
+            chol        REAL,
+            fbs         INTEGER,
+            restecg     INTEGER,
+            thalach     REAL,
+            exang       INTEGER,
+            oldpeak     REAL,
+            slope       INTEGER,
+            ca          INTEGER,
+            thal        INTEGER,
+            prediction  INTEGER NOT NULL,
+            probability REAL,
+            created_at  INTEGER NOT NULL,
+            created_by  TEXT
+        )
+    """)
+
+def _v2_copy_batch(conn, limit: int = -1) -> int:
+    """Copies the next old rows not yet in submissions_v2; returns how many."""
+    from scoring import DIAGNOSIS_POSITIVE
+
+    after = conn.execute("SELECT IFNULL(MAX(row_id), 0) FROM submissions_v2").fetchone()[0]
+    # Legacy rows get created_at from their ID's YYYYMMDD (local midnight).
+    return conn.execute(f"""
+        INSERT INTO submissions_v2 ({_V2_COLUMNS})
+        SELECT rowid, id, age, sex, cp, trestbps, chol, fbs, restecg, thalach, exang,
+               oldpeak, slope, ca, thal,
+               IFNULL(diagnosis = ?, 0), NULL,
+               IFNULL(CAST(strftime('%s', substr(id, 1, 4) || '-' || substr(id, 5, 2) || '-'
+                                    || substr(id, 7, 2), 'utc') AS INTEGER), 0),
+               NULL
+        FROM submissions WHERE rowid > ? ORDER BY rowid LIMIT ?
+    """, (DIAGNOSIS_POSITIVE, after, limit)).rowcount
+
+def _v2_backfill():
+    with transaction(immediate=True) as conn:
+        if schema_version(conn) >= 2:
+            return
+        _v2_create(conn)
+    while True:
+        with transaction(immediate=True) as conn:
+            if schema_version(conn) >= 2 or not _v2_copy_batch(conn, V2_COPY_BATCH):
+                return
+
+@migration(2, "Compact submissions table with prediction, created_at and created_by",
+           backfill=_v2_backfill, vacuum=True)
+def _v2_compact_submissions(conn):
+    _v2_create(conn)
+    _v2_copy_batch(conn)  # rows added since the backfill finished
+    conn.execute("DROP TABLE submissions")
+    conn.execute("ALTER TABLE submissions_v2 RENAME TO submissions")
+    # Date ranges seek the UNIQUE index on id (IDs start with YYYYMMDD);
+    # time- and user-scoped queries seek these:
+    conn.execute("CREATE INDEX idx_submissions_created_at ON submissions (created_at)")
+    conn.execute("CREATE INDEX idx_submissions_created_by ON submissions (created_by, created_at)")
+    conn.execute("CREATE INDEX idx_submissions_prediction ON submissions (prediction)")
+    conn.execute("CREATE INDEX idx_submissions_age ON submissions (age)")
+    conn.execute("CREATE INDEX idx_submissions_chol ON submissions (chol)")
+    # Bulk jobs record who submitted them, for the rows they create
+    conn.execute("ALTER TABLE jobs ADD COLUMN created_by TEXT")
+
+# ─── v3) Dashboard aggregates ─────────────────────────────────────────────────────
+# Per-day totals and feature histograms, maintained by aggregates.record()
+# as submissions are saved (see aggregates.py), so the Dashboard page never
+# scans the submissions table.
+@migration(3, "Dashboard aggregate tables")
+def _v3_aggregates(conn):
+    from aggregates import rebuild
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS agg_daily (
+            day        TEXT PRIMARY KEY,
+            total      INTEGER NOT NULL,
+            positive   INTEGER NOT NULL,
+            prob_sum   REAL NOT NULL,
+            prob_count INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS agg_histogram (
+            feature    TEXT NOT NULL,
+            day        TEXT NOT NULL,
+            bucket     REAL NOT NULL,
+            prediction INTEGER NOT NULL,
+            count      INTEGER NOT NULL,
+            PRIMARY KEY (feature, day, bucket, prediction)
+        ) WITHOUT ROWID
+    """)
+    rebuild()  # joins this transaction
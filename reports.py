@@ -0,0 +1,490 @@
+# reports.py
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from io import BytesIO
+import multiprocessing
+import tempfile
+import zipfile
+import zlib
+
+from fpdf import FPDF
+from fpdf.util import escape_parens
+
+from metrics import counter, timed
+
+# ─── 1) Single-report layout (fpdf2) ──────────────────────────────────────────────
+# The per-patient values, in the order they appear under "Patient Information".
+REPORT_FIELDS = [
+    ("Age", 'age'),
+    ("Sex", 'sex'),
+    ("Chest Pain Type", 'cp'),
+    ("Resting Blood Pressure", 'trestbps'),
+    ("Cholesterol", 'chol'),
+    ("Fasting Blood Sugar", 'fbs'),
+    ("Resting ECG", 'restecg'),
+    ("Max Heart Rate", 'thalach'),
+    ("Exercise Induced Angina", 'exang'),
+    ("Oldpeak", 'oldpeak'),
+    ("Slope", 'slope'),
+    ("CA (vessels colored)", 'ca'),
+    ("Thal", 'thal'),
+]
+
+# A submission may carry a pre-filled report body (see ReportTemplate.fill)
+# under this key, e.g. one taken from the result cache.
+BODY_KEY = 'report_body'
+
+def risk_text(probability) -> str:
+    """A probability of heart disease as shown in reports, e.g. '73.4%'."""
+    if probability is None or probability != probability:  # None or NaN: not scored
+        return "n/a"
+    return f"{probability:.1%}"
+
+def _body_values(submission: dict) -> dict:
+    """The text of the 13 field slots and the diagnosis and risk slots."""
+    # Always printed as floats, as the form and CSVs give them, so a patient
+    # read back from the database (categoricals stored as integers) prints
+    # the same: '1.0', not '1'
+    values = {key: f"{float(submission[key])}" for _, key in REPORT_FIELDS}
+    values['diagnosis'] = f"{submission['diagnosis']}"
+    values['risk'] = risk_text(submission.get('probability'))
+    return values
+
+def _stamp_values(submission: dict) -> dict:
+    """The text of the per-report slots: date and patient ID."""
+    # Convert UTC → IST for timestamp
+    now_ist = datetime.utcnow() + timedelta(hours=5, minutes=30)
+    return {'date': now_ist.strftime('%Y-%m-%d %H:%M:%S'), 'id': f"{submission['id']}"}
+
+def _report_values(submission: dict) -> dict:
+    """The text of every variable slot in a report: date, id, 13 fields, diagnosis and risk."""
+    return {**_body_values(submission), **_stamp_values(submission)}
+
+def _layout(pdf: FPDF, values: dict):
+    """Lays out the hospital‐style single-page report on pdf's current page."""
+    # HEADER
+    pdf.set_font("Helvetica", 'B', 16)
+    pdf.set_text_color(30, 30, 120)
+    pdf.cell(0, 10, "Shoolini Health Center", ln=True, align='C')
+    pdf.set_font("Helvetica", '', 12)
+    pdf.set_text_color(0, 0, 0)
+    pdf.cell(0, 8, "Heart Disease Detection Unit", ln=True, align='C')
+    pdf.cell(0, 8, 
+             "Solan-Oachghat-Kumarhatti Highway, Bajhol, Himachal Pradesh 173229, India",
+             ln=True, align='C')
+    pdf.cell(0, 8, "Phone: +917207314640 | Email: healthcenter@shooliniuniversity.com",
+             ln=True, align='C')
+    pdf.ln(10)
+
+    # TITLE + META
+    pdf.set_font("Helvetica", 'B', 14)
+    pdf.cell(0, 10, "Patient Heart Disease Report", ln=True, align='L')
+    pdf.set_font("Helvetica", '', 10)
+    pdf.cell(0, 8, f"Date: {values['date']} IST", ln=True)
+    pdf.cell(0, 8, f"Patient ID: {values['id']}", ln=True)
+    pdf.ln(8)
+
+    # PATIENT INFO
+    pdf.set_font("Helvetica", 'B', 13)
+    pdf.cell(0, 10, "Patient Information", ln=True)
+    pdf.set_font("Helvetica", '', 10)
+    for label, key in REPORT_FIELDS:
+        pdf.cell(0, 8, f"{label}: {values[key]}", ln=True)
+    pdf.ln(8)
+
+    # DIAGNOSIS
+    pdf.set_font("Helvetica", 'B', 13)
+    pdf.cell(0, 10, "Diagnosis", ln=True)
+    pdf.set_font("Helvetica", '', 10)
+    pdf.multi_cell(0, 8, values['diagnosis'], ln=1)
+    pdf.cell(0, 8, f"Estimated risk (model probability): {values['risk']}", ln=True)
+
+    # FOOTER
+    pdf.set_y(-30)
+    pdf.set_font("Helvetica", 'I', 9)
+    pdf.set_text_color(100, 100, 100)
+    pdf.cell(0, 8, 
+        "This is a computer-generated report. For critical interpretation, consult a certified cardiologist.",
+        ln=True, align='C'
+    )
+
+def build_pdf(submission: dict) -> FPDF:
+    """
+    Lays out the full report for one submission dict from scratch.
+    Returns the FPDF document, ready to be written wherever it's needed.
+    """
+    pdf = FPDF(format='letter')
+    pdf.add_page()
+    _layout(pdf, _report_values(submission))
+    return pdf
+
+# ─── 2) Template renderer ─────────────────────────────────────────────────────────
+class ReportTemplate:
+    """
+    The report page pre-rendered once with placeholder markers in every
+    variable slot. Each report then only escapes its 17 values and splices
+    them into the cached content stream, instead of re-running the layout;
+    the page content is identical to build_pdf()'s.
+
+    All variable text is left-aligned, so the static text around the slots
+    never moves. A diagnosis long enough to wrap falls back to build_pdf().
+
+    Filling happens in two steps: fill() stamps the fields, diagnosis and risk
+    into a "report body", which depends only on those values and so can be
+    cached and reused; page_content() then adds the date and patient ID.
+    """
+
+    _MARKER = re.compile(rb'@@(\w+)@@')
+
+    def __init__(self):
+        pdf = FPDF(format='letter')
+        pdf.add_page()
+        slots = ['date', 'id', *(key for _, key in REPORT_FIELDS), 'diagnosis', 'risk']
+        _layout(pdf, {key: f"@@{key}@@" for key in slots})
+        # Even items are static content-stream bytes, odd items slot names.
+        self._parts = [
+            part.decode() if i % 2 else bytes(part)
+            for i, part in enumerate(self._MARKER.split(bytes(pdf.pages[1].contents)))
+        ]
+        self._fonts = pdf.fonts
+        # (resource number, base font) pairs, e.g. (1, 'Helvetica-Bold') for /F1
+        self.font_names = sorted((font['i'], font['name']) for font in pdf.fonts.values())
+        self.page_size = (pdf.w_pt, pdf.h_pt)
+        # multi_cell wraps at the cell width minus its inner margins.
+        self._diagnosis_width = pdf.epw - 2 * pdf.c_margin
+        self._measure = FPDF()
+        self._measure.set_font("Helvetica", '', 10)
+
+    def fill(self, submission: dict) -> tuple:
+        """
+        Returns the report body for a submission's 13 fields, diagnosis and risk:
+        the content stream with only the date and patient ID slots left
+        open, as (bytes, 'date', bytes, 'id', bytes). Returns None when the
+        diagnosis would wrap (build_pdf() is used for those).
+        """
+        values = _body_values(submission)
+        if self._measure.get_string_width(values['diagnosis']) > self._diagnosis_width:
+            return None
+        body, pending = [], b''
+        for i, part in enumerate(self._parts):
+            if i % 2 == 0:
+                pending += part
+            elif part in values:
+                pending += escape_parens(values[part]).encode('latin-1')
+            else:
+                body += [pending, part]
+                pending = b''
+        body.append(pending)
+        return tuple(body)
+
+    def page_content(self, submission: dict, body: tuple = None) -> bytes:
+        """
+        Returns the page's (uncompressed) content stream for one submission,
+        from `body` (or the submission's BODY_KEY) when given.
+        """
+        if body is None:
+            body = submission.get(BODY_KEY) or self.fill(submission)
+        if body is None:
+            # The full layout registers the same fonts in the same order.
+            return bytes(build_pdf(submission).pages[1].contents)
+        values = _stamp_values(submission)
+        return b''.join(
+            escape_parens(values[part]).encode('latin-1') if i % 2 else part
+            for i, part in enumerate(body)
+        )
+
+    def render(self, submission: dict, body: tuple = None) -> FPDF:
+        """Returns the FPDF document for one submission."""
+        pdf = FPDF(format='letter')
+        pdf.add_page()
+        pdf.fonts = dict(self._fonts)
+        pdf.pages[1].contents = bytearray(self.page_content(submission, body))
+        return pdf
+
+_template = None
+
+def report_template() -> ReportTemplate:
+    """The process-wide ReportTemplate, built on first use (once per pool worker too)."""
+    global _template
+    if _template is None:
+        _template = ReportTemplate()
+    return _template
+
+@timed('pdf_generate', "generate_pdf() for one report")
+def generate_pdf(submission: dict) -> BytesIO:
+    """
+    Creates a hospital‐style single-page PDF for one submission dict.
+    Returns a BytesIO buffer ready for download.
+    """
+    buf = BytesIO()
+    report_template().render(submission).output(buf)
+    buf.seek(0)
+    return buf
+
+def render_pdf_bytes(submission: dict) -> bytearray:
+    """Renders one submission and returns the raw PDF bytes."""
+    return report_template().render(submission).output()
+
+# ─── 3) Parallel rendering pool ───────────────────────────────────────────────────
+def default_pdf_workers() -> int:
+    """Worker count from $HDD_PDF_WORKERS, defaulting to the number of CPUs."""
+    env = os.environ.get('HDD_PDF_WORKERS')
+    if env:
+        return max(1, int(env))
+    return os.cpu_count() or 1
+
+def make_pdf_pool(workers: int) -> ProcessPoolExecutor:
+    """Creates a rendering pool that can be reused across many batches."""
+    # 'spawn' keeps workers clean of the (multi-threaded) Streamlit server state.
+    ctx = multiprocessing.get_context('spawn')
+    return ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
+
+def render_pdfs(submissions, workers: int = 1, chunksize: int = 32, pool=None):
+    """
+    Renders many submissions, yielding (submission_id, pdf_bytes) in input order.
+
+    With workers > 1 (or an existing `pool`) the rendering is fanned out over
+    a process pool; the caller stays the single writer of whatever archive
+    the bytes go into.
+    """
+    submissions = list(submissions)
+    if pool is None and (workers <= 1 or len(submissions) <= 1):
+        for sub in submissions:
+            yield sub['id'], render_pdf_bytes(sub)
+        return
+
+    if pool is not None:
+        pdfs = pool.map(render_pdf_bytes, submissions, chunksize=chunksize)
+        for sub, data in zip(submissions, pdfs):
+            yield sub['id'], data
+        return
+
+    with make_pdf_pool(min(workers, len(submissions))) as own_pool:
+        yield from render_pdfs(submissions, chunksize=chunksize, pool=own_pool)
+
+# ─── 4) Streaming ZIP archive ─────────────────────────────────────────────────────
+# PDFs are already deflated internally, so storing them is the sensible default.
+
+_bulk_reports = counter('pdf_reports', "Reports rendered into ZIPs and combined PDFs")
+
+class ReportArchive:
+    """
+    A bulk-report ZIP that batches of submissions are appended to as they
+    are produced. The archive lives in a named temp file on disk (deleted
+    when closed), so memory doesn't grow while it is built. Serve the
+    finished file through downloads.py, which streams it: passing it to
+    st.download_button would read the whole archive into memory.
+
+    Single-process rendering writes each PDF straight into its ZIP entry;
+    with workers > 1 one process pool is shared by every batch and each
+    PDF's bytes are written as soon as they arrive. An existing `pool` can
+    be passed in instead; it is left running on close.
+    """
+
+    def __init__(self, workers: int = 1, compression: int = zipfile.ZIP_STORED,
+                 fileobj=None, pool=None):
+        self.file = fileobj if fileobj is not None else tempfile.NamedTemporaryFile(
+            suffix='.zip'
+        )
+        self.workers = workers
+        self.count = 0
+        self._zip = zipfile.ZipFile(self.file, "w", compression=compression)
+        self._owns_pool = pool is None and workers > 1
+        self._pool = pool if pool is not None else (
+            make_pdf_pool(workers) if workers > 1 else None
+        )
+
+    @timed('pdf_archive_batch', "Rendering a batch of reports into a ZIP")
+    def add(self, submissions):
+        """Renders and appends one report_<patient_id>.pdf per submission."""
+        start = self.count
+        if self._pool is None:
+            for sub in submissions:
+                with self._zip.open(f"report_{sub['id']}.pdf", "w") as entry:
+                    report_template().render(sub).output(entry)
+                self.count += 1
+        else:
+            for pid, pdf_bytes in render_pdfs(submissions, pool=self._pool):
+                self._zip.writestr(f"report_{pid}.pdf", pdf_bytes)
+                self.count += 1
+        _bulk_reports.inc(self.count - start)
+
+    def close(self):
+        """Finishes the ZIP and returns its file, rewound to the start."""
+        if self._owns_pool:
+            self._pool.shutdown()
+        self._pool = None
+        self._zip.close()
+        self.file.seek(0)
+        return self.file
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            if self._owns_pool:
+                self._pool.shutdown(cancel_futures=True)
+            try:
+                # Close the ZipFile before its file, or it tries to finish the
+                # (discarded) archive on garbage collection
+                self._zip.close()
+            except (OSError, ValueError):
+                pass
+            self.file.close()
+
+def write_zip(fileobj, submissions, workers: int = 1,
+              compression: int = zipfile.ZIP_STORED):
+    """Streams one report_<patient_id>.pdf entry per submission into fileobj."""
+    with ReportArchive(workers=workers, compression=compression, fileobj=fileobj) as archive:
+        archive.add(submissions)
+
+def archive_reports(submissions, workers: int = 1,
+                    compression: int = zipfile.ZIP_STORED):
+    """
+    Builds the bulk ZIP in a temp file on disk. Returns the file rewound to
+    the start; it is deleted when closed. Only building is bounded in
+    memory; see ReportArchive for serving it.
+    """
+    with ReportArchive(workers=workers, compression=compression) as archive:
+        archive.add(submissions)
+    return archive.file
+
+# ─── 5) Combined multi-patient PDF ────────────────────────────────────────────────
+class CombinedReport:
+    """
+    Every report in one PDF, one patient per page, with an outline
+    (bookmark) entry per patient ID.
+
+    Pages come from the ReportTemplate content streams and are written
+    straight to a named temp file (deleted when closed) as they are added;
+    the fonts are written once for the whole document. Only each object's
+    byte offset is kept in memory, so a 10k-patient document costs about
+    as much RAM as a small one. Same add()/close() interface as
+    ReportArchive.
+    """
+
+    # Fixed object numbers; fonts follow, then three objects per page.
+    _PAGES, _CATALOG, _RESOURCES, _OUTLINES, _INFO = 1, 2, 3, 4, 5
+
+    def __init__(self, fileobj=None, compress: bool = True):
+        self.file = fileobj if fileobj is not None else tempfile.NamedTemporaryFile(
+            suffix='.pdf'
+        )
+        self.compress = compress
+        self.count = 0
+        self._template = report_template()
+        self._offsets = {}        # object number -> byte offset
+        self._pos = 0
+        self._page_objs = []      # for the /Kids of the page tree
+        self._pending_item = None # outline entry waiting to learn its /Next
+        self._first_item = None
+
+        self._write(b"%PDF-1.3\n")
+        fonts = []
+        for num, (i, name) in enumerate(self._template.font_names, start=self._INFO + 1):
+            self._object(num, f"<< /Type /Font /Subtype /Type1 /BaseFont /{name} "
+                              f"/Encoding /WinAnsiEncoding >>")
+            fonts.append(f"/F{i} {num} 0 R")
+        self._object(self._RESOURCES, f"<< /Font << {' '.join(fonts)} >> "
+                                      f"/ProcSet [/PDF /Text] >>")
+        self._next_obj = self._INFO + 1 + len(fonts)
+
+    def _write(self, data: bytes):
+        self.file.write(data)
+        self._pos += len(data)
+
+    def _object(self, num: int, body, stream: bytes = None):
+        self._offsets[num] = self._pos
+        self._write(f"{num} 0 obj\n{body}\n".encode('latin-1'))
+        if stream is not None:
+            self._write(b"stream\n" + stream + b"\nendstream\n")
+        self._write(b"endobj\n")
+
+    def _outline_item(self, num: int, title: str, page: int, prev, next_):
+        links = (f" /Prev {prev} 0 R" if prev else "") + (f" /Next {next_} 0 R" if next_ else "")
+        self._object(num, (
+            f"<< /Title <feff{title.encode('utf-16-be').hex()}> /Parent {self._OUTLINES} 0 R"
+            f" /Dest [{page} 0 R /XYZ 0 {self._template.page_size[1]:.2f} null]{links} >>"
+        ))
+
+    @timed('pdf_combined_batch', "Rendering a batch of pages into a combined PDF")
+    def add(self, submissions):
+        """Appends one page per submission, bookmarked by its patient ID."""
+        start = self.count
+        for sub in submissions:
+            page, contents, item = self._next_obj, self._next_obj + 1, self._next_obj + 2
+            self._next_obj += 3
+
+            content = self._template.page_content(sub)
+            filters = ""
+            if self.compress:
+                content = zlib.compress(content)
+                filters = " /Filter /FlateDecode"
+            self._object(page, f"<< /Type /Page /Parent {self._PAGES} 0 R "
+                               f"/Resources {self._RESOURCES} 0 R /Contents {contents} 0 R >>")
+            self._object(contents, f"<< /Length {len(content)}{filters} >>", stream=content)
+            self._page_objs.append(page)
+
+            if self._pending_item is not None:
+                self._outline_item(*self._pending_item, next_=item)
+            self._pending_item = (item, f"{sub['id']}", page,
+                                  self._pending_item[0] if self._pending_item else None)
+            if self._first_item is None:
+                self._first_item = item
+            self.count += 1
+        _bulk_reports.inc(self.count - start)
+
+    def close(self):
+        """Writes the page tree, outline and cross-reference table; returns the file rewound."""
+        last_item = None
+        if self._pending_item is not None:
+            last_item = self._pending_item[0]
+            self._outline_item(*self._pending_item, next_=None)
+            self._pending_item = None
+        outline_ends = (f" /First {self._first_item} 0 R /Last {last_item} 0 R"
+                        if last_item else "")
+        self._object(self._OUTLINES,
+                     f"<< /Type /Outlines /Count {self.count}{outline_ends} >>")
+
+        width, height = self._template.page_size
+        kids = ' '.join(f"{num} 0 R" for num in self._page_objs)
+        self._object(self._PAGES, f"<< /Type /Pages /Count {self.count} /Kids [{kids}] "
+                                  f"/MediaBox [0 0 {width:.2f} {height:.2f}] >>")
+        self._object(self._CATALOG, f"<< /Type /Catalog /Pages {self._PAGES} 0 R "
+                                    f"/Outlines {self._OUTLINES} 0 R /PageMode /UseOutlines >>")
+        self._object(self._INFO, f"<< /Title (Heart Disease Reports) /CreationDate "
+                                 f"(D:{datetime.utcnow().strftime('%Y%m%d%H%M%S')}Z) >>")
+
+        xref_pos = self._pos
+        xref = [f"xref\n0 {self._next_obj}\n", "0000000000 65535 f \n"]
+        xref += [f"{self._offsets[num]:010d} 00000 n \n" for num in range(1, self._next_obj)]
+        xref.append(f"trailer\n<< /Size {self._next_obj} /Root {self._CATALOG} 0 R "
+                    f"/Info {self._INFO} 0 R >>\nstartxref\n{xref_pos}\n%%EOF\n")
+        self._write(''.join(xref).encode('latin-1'))
+        self.file.flush()
+        self.file.seek(0)
+        return self.file
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+def combine_reports(submissions):
+    """
+    Builds one bookmarked PDF (one patient per page) in a temp file on disk.
+    Returns the file rewound to the start; it is deleted when closed.
+    """
+    with CombinedReport() as report:
+        report.add(submissions)
+    return report.file
@@ -0,0 +1,116 @@
+# resources.py
+
+import logging
+import os
+import threading
+
+import streamlit as st
+
+from db import DB_FILE, init_db
+
+MODEL_FILE = 'heart_disease_model.sav'  # same default as scoring.MODEL_FILE
+
+log = logging.getLogger('hdd.resources')
+
+# Streamlit re-executes app.py on every widget interaction; anything expensive
+# that doesn't change between reruns is built once per process here.
+
+# ─── 1) Database ──────────────────────────────────────────────────────────────────
+@st.cache_resource(show_spinner=False)
+def _init_db_once(db_file: str) -> bool:
+    init_db()
+    return True
+
+def ensure_db():
+    """Runs the schema DDL once per process (per DB file) instead of per rerun."""
+    _init_db_once(DB_FILE)
+
+# ─── 2) ML model ──────────────────────────────────────────────────────────────────
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _load_model(path: str, mtime: float):
+    from scoring import load_model  # numpy is only needed once a page scores
+    return load_model(path)
+
+def get_model(path: str = MODEL_FILE):
+    """
+    Returns the cached model. The mtimes of the .sav file and of its exported
+    .npz scorer are part of the cache key, so replacing either makes the next
+    rerun load the new model.
+    """
+    scorer_path = os.path.splitext(path)[0] + '.npz'
+    mtime = os.path.getmtime(path)
+    if os.path.exists(scorer_path):
+        mtime = max(mtime, os.path.getmtime(scorer_path))
+    return _load_model(path, mtime)
+
+def invalidate_model():
+    """Drops the cached model so the next get_model() reloads it from disk."""
+    _load_model.clear()
+
+@st.cache_resource(show_spinner=False)
+def get_result_cache():
+    """The app process's ResultCache (scoring results and report bodies)."""
+    from cache import ResultCache
+    return ResultCache()
+
+# ─── 3) Static assets ─────────────────────────────────────────────────────────────
+@st.cache_resource(show_spinner=False)
+def load_asset(path: str) -> bytes:
+    """Reads a static file (e.g. the Heart.png logo) once per process."""
+    with open(path, 'rb') as f:
+        return f.read()
+
+# ─── 4) Metrics ───────────────────────────────────────────────────────────────────
+@st.cache_resource(show_spinner=False)
+def _start_metrics() -> bool:
+    from metrics import start_exporters
+    start_exporters()
+    return True
+
+def ensure_metrics():
+    """Starts this process's metrics endpoint/JSON dump once (see metrics.py)."""
+    _start_metrics()
+
+# ─── 5) Background job worker ─────────────────────────────────────────────────────
+@st.cache_resource(show_spinner=False)
+def _job_worker_slot(db_file: str) -> dict:
+    """This app process's worker (a Popen, once started) and the lock guarding it."""
+    return {'proc': None, 'lock': threading.Lock()}
+
+def ensure_job_worker():
+    """
+    Keeps one bulk-report worker process (jobs.py) running per app process,
+    starting it again if it has died (it resumes interrupted jobs); it exits
+    with the app. Set HDD_JOB_WORKER=0 when workers are run separately.
+    """
+    if os.environ.get('HDD_JOB_WORKER', '1') == '0':
+        return
+    slot = _job_worker_slot(DB_FILE)
+    with slot['lock']:
+        proc = slot['proc']
+        if proc is not None and proc.poll() is None:
+            return
+        if proc is not None:
+            log.warning("Job worker exited with code %s; restarting it", proc.returncode)
+        import subprocess
+        import sys
+        worker = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs.py')
+        slot['proc'] = subprocess.Popen(
+            [sys.executable, worker, '--parent-pid', str(os.getpid())]
+        )
+
+# ─── 6) Downloads ─────────────────────────────────────────────────────────────────
+@st.cache_resource(show_spinner=False)
+def _start_downloads() -> bool:
+    from downloads import start_downloads
+    return start_downloads()
+
+def download_link(path: str, filename: str, mime: str, delete: bool = False):
+    """
+    Link that streams `path` from disk (see downloads.py), on the host the
+    page was loaded from; None when the download route isn't running.
+    """
+    if not _start_downloads():
+        return None
+    from downloads import download_url, publish
+    return download_url(publish(path, filename, mime, delete), st.context.headers.get('Host'))
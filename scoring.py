@@ -0,0 +1,314 @@
+# scoring.py
+
+import hashlib
+import math
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from metrics import timed
+
+MODEL_FILE = 'heart_disease_model.sav'
+SCORER_FILE = 'heart_disease_model.npz'  # written by export_model.py
+
+# The 13 model features, in the order the model was trained on.
+FEATURE_COLS = [
+    'age', 'sex', 'cp', 'trestbps', 'chol', 'fbs',
+    'restecg', 'thalach', 'exang', 'oldpeak', 'slope', 'ca', 'thal'
+]
+
+# Columns a Bulk Reports CSV must provide.
+REQUIRED_COLS = FEATURE_COLS + ['target']
+
+DIAGNOSIS_POSITIVE = 'The person is having heart disease'
+DIAGNOSIS_NEGATIVE = 'The person does not have any heart disease'
+
+# Value range of each feature in the UCI heart dataset the model was trained
+# on, e.g. for the what-if sweep. Categorical features take integer steps.
+FEATURE_RANGES = {
+    'age': (29, 77), 'sex': (0, 1), 'cp': (0, 3), 'trestbps': (94, 200),
+    'chol': (126, 564), 'fbs': (0, 1), 'restecg': (0, 2), 'thalach': (71, 202),
+    'exang': (0, 1), 'oldpeak': (0.0, 6.2), 'slope': (0, 2), 'ca': (0, 4), 'thal': (0, 3),
+}
+CATEGORICAL_COLS = ['sex', 'cp', 'fbs', 'restecg', 'exang', 'slope', 'ca', 'thal']
+
+
+def model_digest(raw: bytes) -> str:
+    """Short content hash of a pickled model file, used as its version."""
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+class LinearScorer:
+    """
+    Validation-free scorer for the exported LogisticRegression weights.
+
+    Gives the same predictions and probabilities as the sklearn model, as a
+    plain dot product plus threshold (or sigmoid), so the runtime does not
+    need to import scikit-learn. Create one with LinearScorer.load() from
+    the .npz written by export_model.py.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, coef, intercept: float, classes, version: str = ''):
+        self.coef = np.asarray(coef, dtype=np.float64).reshape(-1)
+        self.intercept = float(intercept)
+        self.classes = np.asarray(classes, dtype=np.int64)
+        self.version = version
+        self._coef_list = self.coef.tolist()
+
+    @classmethod
+    def load(cls, path: str = SCORER_FILE) -> 'LinearScorer':
+        with np.load(path, allow_pickle=False) as data:
+            fmt = int(data['format_version'])
+            if fmt != cls.FORMAT_VERSION:
+                raise ValueError(f"Unsupported scorer format {fmt} in {path}")
+            names = [str(n) for n in data['feature_names']]
+            if names != FEATURE_COLS:
+                raise ValueError(f"Scorer features {names} do not match {FEATURE_COLS}")
+            return cls(data['coef'], data['intercept'][0], data['classes'],
+                       str(data['model_version']))
+
+    def save(self, path: str = SCORER_FILE):
+        np.savez(
+            path,
+            format_version=np.int64(self.FORMAT_VERSION),
+            model_version=np.str_(self.version),
+            feature_names=np.array(FEATURE_COLS),
+            coef=self.coef,
+            intercept=np.array([self.intercept]),
+            classes=self.classes,
+        )
+
+    # Batch API (same shapes as sklearn's)
+    def decision_function(self, X) -> np.ndarray:
+        return np.asarray(X, dtype=np.float64) @ self.coef + self.intercept
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes[(self.decision_function(X) > 0).astype(np.int64)]
+
+    def predict_proba(self, X) -> np.ndarray:
+        # 0.5 * (1 + tanh(z / 2)) is the logistic sigmoid without exp() overflow.
+        p = 0.5 * (1.0 + np.tanh(0.5 * self.decision_function(X)))
+        return np.column_stack([1.0 - p, p])
+
+    # Single-row API: plain Python floats, no array allocation
+    def predict_one(self, row) -> int:
+        z = self.intercept + sum(c * x for c, x in zip(self._coef_list, row))
+        return int(self.classes[1] if z > 0 else self.classes[0])
+
+    def predict_proba_one(self, row) -> float:
+        z = self.intercept + sum(c * x for c, x in zip(self._coef_list, row))
+        return 0.5 * (1.0 + math.tanh(0.5 * z))
+
+    def score_one(self, row) -> tuple:
+        """(prediction, probability of class 1) from a single dot product."""
+        z = self.intercept + sum(c * x for c, x in zip(self._coef_list, row))
+        pred = int(self.classes[1] if z > 0 else self.classes[0])
+        return pred, 0.5 * (1.0 + math.tanh(0.5 * z))
+
+    def score(self, X) -> tuple:
+        """(predictions, probabilities of class 1) from a single matrix product."""
+        z = self.decision_function(X)
+        return self.classes[(z > 0).astype(np.int64)], 0.5 * (1.0 + np.tanh(0.5 * z))
+
+
+def load_model(path: str = MODEL_FILE):
+    """
+    Loads the model (no caching; see resources.get_model for the app).
+
+    If an exported scorer (.npz) sits next to the .sav and was exported from
+    that exact file, the LinearScorer is returned and scikit-learn is never
+    imported; otherwise the pickled sklearn model is loaded.
+    """
+    if path.endswith('.npz'):
+        return LinearScorer.load(path)
+    with open(path, 'rb') as f:
+        raw = f.read()
+    scorer_path = os.path.splitext(path)[0] + '.npz'
+    if os.path.exists(scorer_path):
+        scorer = LinearScorer.load(scorer_path)
+        if scorer.version == model_digest(raw):
+            return scorer
+    model = pickle.loads(raw)
+    model.version = model_digest(raw)  # same digest the exported scorer carries
+    return model
+
+
+def model_version(model) -> str:
+    """The content digest of the model file a loaded model came from."""
+    return getattr(model, 'version', '')
+
+
+def parse_features(values) -> list:
+    """
+    Validates one patient's 13 features and returns them as floats, in
+    FEATURE_COLS order. Accepts either a sequence of 13 values or a mapping
+    keyed by feature name. Raises ValueError on anything missing, non-numeric
+    or non-finite.
+    """
+    if isinstance(values, (str, bytes, bytearray)):
+        # list() would split it into characters: "1111111111111" is not 13 features
+        raise ValueError(f"Expected {len(FEATURE_COLS)} features, got a string")
+    if isinstance(values, dict):
+        missing = [col for col in FEATURE_COLS if col not in values]
+        if missing:
+            raise ValueError(f"Missing features: {missing}")
+        values = [values[col] for col in FEATURE_COLS]
+    values = list(values)
+    if len(values) != len(FEATURE_COLS):
+        raise ValueError(f"Expected {len(FEATURE_COLS)} features, got {len(values)}")
+    try:
+        floats = [float(x) for x in values]
+    except (TypeError, ValueError):
+        raise ValueError("All fields must be numeric.") from None
+    if not all(math.isfinite(x) for x in floats):
+        raise ValueError("All fields must be numeric.")
+    return floats
+
+
+def diagnosis_text(pred) -> str:
+    """Map a 0/1 prediction to the diagnosis sentence shown in reports."""
+    return DIAGNOSIS_POSITIVE if int(pred) == 1 else DIAGNOSIS_NEGATIVE
+
+
+def diagnosis_texts(preds: np.ndarray) -> np.ndarray:
+    """Vectorized diagnosis_text() over an array of 0/1 predictions."""
+    return np.where(np.asarray(preds) == 1, DIAGNOSIS_POSITIVE, DIAGNOSIS_NEGATIVE)
+
+
+def feature_matrix(df: pd.DataFrame) -> np.ndarray:
+    """Return the (n, 13) float64 feature matrix for a DataFrame."""
+    return df[FEATURE_COLS].to_numpy(dtype=np.float64)
+
+
+@timed('model_predict_batch', "Model call over a feature matrix")
+def predict_batch(model, X: np.ndarray) -> np.ndarray:
+    """
+    Runs the model once over a whole (n, 13) feature matrix.
+    Returns an int array of 0/1 predictions.
+    """
+    if len(X) == 0:
+        return np.empty(0, dtype=np.int64)
+    if isinstance(model, LinearScorer):
+        return model.predict(X)
+    # Wrap in a DataFrame so the column names match those the model was fitted with.
+    frame = pd.DataFrame(X, columns=FEATURE_COLS, copy=False)
+    return np.asarray(model.predict(frame), dtype=np.int64)
+
+
+@timed('model_predict', "Model call for one patient")
+def predict_one(model, inputs: list) -> int:
+    """Predicts one already-validated patient (see parse_features)."""
+    if isinstance(model, LinearScorer):
+        return model.predict_one(inputs)
+    return int(predict_batch(model, np.array([inputs]))[0])
+
+
+@timed('model_score_batch', "Model call (predictions and probabilities) over a feature matrix")
+def score_batch(model, X: np.ndarray) -> tuple:
+    """
+    Runs the model once over a (n, 13) feature matrix and returns
+    (0/1 predictions, probabilities of heart disease), both as arrays.
+    The predictions are the ones predict_batch() would give.
+    """
+    if len(X) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    if isinstance(model, LinearScorer):
+        return model.score(X)
+    frame = pd.DataFrame(X, columns=FEATURE_COLS, copy=False)
+    proba = model.predict_proba(frame)
+    classes = np.asarray(model.classes_, dtype=np.int64)
+    # LogisticRegression predicts the class with the higher probability
+    return classes[proba.argmax(axis=1)], proba[:, list(classes).index(1)]
+
+
+@timed('model_score', "Model call (prediction and probability) for one patient")
+def score_one(model, inputs: list) -> tuple:
+    """(prediction, probability of heart disease) for one validated patient."""
+    if isinstance(model, LinearScorer):
+        return model.score_one(inputs)
+    preds, probs = score_batch(model, np.array([inputs], dtype=np.float64))
+    return int(preds[0]), float(probs[0])
+
+
+def sweep_values(feature: str, low: float, high: float, points: int = 50) -> np.ndarray:
+    """The grid a what-if sweep scores: integer steps for categorical features."""
+    if feature in CATEGORICAL_COLS:
+        return np.arange(math.ceil(low), math.floor(high) + 1, dtype=np.float64)
+    return np.linspace(low, high, points)
+
+
+def sweep(model, inputs: list, feature: str, values) -> tuple:
+    """
+    What-if scoring: copies of one patient with `feature` set to each of
+    `values`, scored in a single batched model call. Returns
+    (predictions, probabilities) in the order of `values`.
+    """
+    X = np.tile(np.asarray(inputs, dtype=np.float64), (len(values), 1))
+    X[:, FEATURE_COLS.index(feature)] = values
+    return score_batch(model, X)
+
+
+def score_frame(df: pd.DataFrame, model=None, use_model: bool = False) -> np.ndarray:
+    """
+    Scores every row of a Bulk Reports DataFrame in one vectorized call.
+
+    With use_model=True the model predicts from the 13 features; otherwise
+    the CSV's own `target` column is trusted, as before.
+    """
+    return score_frame_proba(df, model, use_model)[0]
+
+
+def _reject_rows(df: pd.DataFrame, bad: np.ndarray, problem: str):
+    """
+    Raises ValueError naming the CSV lines of the rows flagged in `bad`
+    (the header is line 1; bulk.read_csv_chunks indexes rows from 0).
+    """
+    if not bad.any():
+        return
+    lines = (df.index[bad] + 2).tolist()
+    shown = ', '.join(map(str, lines[:10]))
+    if len(lines) > 10:
+        shown += f" and {len(lines) - 10} more"
+    raise ValueError(f"{problem} on CSV line(s) {shown}")
+
+
+def _checked_features(df: pd.DataFrame) -> np.ndarray:
+    X = feature_matrix(df)
+    # The exported LinearScorer doesn't validate input (sklearn would raise)
+    _reject_rows(df, ~np.isfinite(X).all(axis=1), "Missing or non-numeric feature values")
+    return X
+
+def _checked_target(df: pd.DataFrame) -> np.ndarray:
+    target = df['target'].to_numpy(dtype=np.float64)
+    _reject_rows(df, ~np.isin(target, (0.0, 1.0)), "target must be 0 or 1")
+    return target.astype(np.int64)
+
+def check_frame(df: pd.DataFrame, use_model: bool = False):
+    """
+    Raises the ValueError score_frame_proba() would for `df`, without
+    scoring it (e.g. to check a whole CSV before anything is saved).
+    """
+    _checked_features(df)
+    if not use_model:
+        _checked_target(df)
+
+def score_frame_proba(df: pd.DataFrame, model=None, use_model: bool = False) -> tuple:
+    """
+    Like score_frame(), but returns (predictions, probabilities) from the
+    same model call. Whenever a model is given its probabilities are
+    returned, even when the diagnosis comes from `target`; without one they
+    are None.
+    Raises ValueError naming the offending rows if a feature is missing or
+    non-finite, or (without the model) a target is not 0 or 1.
+    """
+    X = _checked_features(df)
+    if use_model and model is None:
+        raise ValueError("A model is required when use_model=True.")
+    preds, probs = score_batch(model, X) if model is not None else (None, None)
+    if use_model:
+        return preds, probs
+    return _checked_target(df), probs
@@ -0,0 +1,132 @@
+# serve.py
+#
+# Headless HTTP scoring API, for machine clients such as the EHR integration.
+# Runs on Tornado (already installed alongside Streamlit) without any of the
+# Streamlit script-rerun machinery:
+#
+#   python serve.py --port 8000 --workers 4
+#
+#   GET  /health          -> {"status": "ok"}
+#   GET  /metrics         -> Prometheus text (this worker process's metrics)
+#   POST /predict         {"features": {...13 named features...} or [13 values]}
+#   POST /predict/batch   {"patients": [<features>, ...]}
+
+import argparse
+import json
+import logging
+
+import numpy as np
+import tornado.httpserver
+import tornado.ioloop
+import tornado.netutil
+import tornado.process
+import tornado.web
+
+import metrics
+from scoring import (
+    FEATURE_COLS, MODEL_FILE, load_model, parse_features, score_one, score_batch,
+    diagnosis_text
+)
+
+MAX_BATCH = 10_000
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+log = logging.getLogger('hdd.serve')
+
+# ─── 1) Handlers ──────────────────────────────────────────────────────────────────
+class _JSONHandler(tornado.web.RequestHandler):
+    def initialize(self, model):
+        self.model = model
+
+    def set_default_headers(self):
+        self.set_header('Content-Type', 'application/json')
+
+    def write_error(self, status_code, **kwargs):
+        exc = kwargs.get('exc_info', (None, None, None))[1]
+        message = exc.log_message if isinstance(exc, tornado.web.HTTPError) else None
+        self.finish({'error': message or self._reason})
+
+    def json_body(self) -> dict:
+        try:
+            body = json.loads(self.request.body or b'{}')
+        except ValueError:
+            raise tornado.web.HTTPError(400, 'Request body must be JSON.')
+        if not isinstance(body, dict):
+            raise tornado.web.HTTPError(400, 'Request body must be a JSON object.')
+        return body
+
+    def parse(self, features, where: str = '') -> list:
+        try:
+            return parse_features(features)
+        except (TypeError, ValueError) as e:
+            raise tornado.web.HTTPError(400, f"{where}{e}")
+
+class HealthHandler(_JSONHandler):
+    def get(self):
+        self.write({'status': 'ok', 'features': FEATURE_COLS})
+
+class MetricsHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.set_header('Content-Type', 'text/plain; version=0.0.4')
+        self.write(metrics.prometheus_text())
+
+class PredictHandler(_JSONHandler):
+    def post(self):
+        inputs = self.parse(self.json_body().get('features'))
+        pred, prob = score_one(self.model, inputs)
+        self.write({'prediction': pred, 'probability': prob, 'diagnosis': diagnosis_text(pred)})
+
+class BatchPredictHandler(_JSONHandler):
+    def post(self):
+        patients = self.json_body().get('patients')
+        if not isinstance(patients, list) or not patients:
+            raise tornado.web.HTTPError(400, '"patients" must be a non-empty list.')
+        if len(patients) > MAX_BATCH:
+            raise tornado.web.HTTPError(400, f'At most {MAX_BATCH} patients per batch.')
+        X = np.array([self.parse(p, f'patients[{i}]: ') for i, p in enumerate(patients)])
+        preds, probs = score_batch(self.model, X)
+        self.write({
+            'predictions': [
+                {'prediction': int(p), 'probability': float(q), 'diagnosis': diagnosis_text(p)}
+                for p, q in zip(preds, probs)
+            ]
+        })
+
+def make_app(model) -> tornado.web.Application:
+    args = {'model': model}
+    return tornado.web.Application([
+        (r'/health', HealthHandler, args),
+        (r'/metrics', MetricsHandler),
+        (r'/predict', PredictHandler, args),
+        (r'/predict/batch', BatchPredictHandler, args),
+    ])
+
+# ─── 2) Entry point ───────────────────────────────────────────────────────────────
+def serve(host: str = '127.0.0.1', port: int = 8000, workers: int = 1,
+          model_path: str = MODEL_FILE):
+    """
+    Loads the model once, then serves it from `workers` forked processes
+    sharing one listening socket (0 = one per CPU).
+    """
+    model = load_model(model_path)
+    sockets = tornado.netutil.bind_sockets(port, address=host)
+    if workers != 1:
+        tornado.process.fork_processes(workers)
+    server = tornado.httpserver.HTTPServer(make_app(model), max_body_size=MAX_BODY_BYTES)
+    server.add_sockets(sockets)
+    log.info("Scoring API listening on http://%s:%d", host, port)
+    tornado.ioloop.IOLoop.current().start()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Heart disease scoring API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=1,
+                        help="worker processes (0 = one per CPU)")
+    parser.add_argument('--model', default=MODEL_FILE)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    serve(args.host, args.port, args.workers, args.model)
+
+if __name__ == '__main__':
+    main()
@@ -72,30 +72,10 @@
 # signup.py
 
 import streamlit as st
-import bcrypt
-import sqlite3
-
-DB_FILE = 'submissions.db'
-
-def load_user(username: str):
-    """Return row (username, name, password_hash) or None if not found."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT username, name, password FROM users WHERE username = ?", (username,))
-    row = cursor.fetchone()
-    conn.close()
-    return row  # tuple or None
-
-def insert_user(username: str, name: str, hashed_password: str):
-    """Insert new user; raise sqlite3.IntegrityError if username exists."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO users (username, name, password) VALUES (?, ?, ?)",
-        (username, name, hashed_password)
-    )
-    conn.commit()
-    conn.close()
+
+from auth import AuthBusy, hash_password
+from resources import load_asset
+from users import create_user, get_user
 
 def signup_page():
     st.markdown("""
@@ -114,7 +94,7 @@ def signup_page():
         </style>
     """, unsafe_allow_html=True)
 
-    st.image("Heart.png", width=120)
+    st.image(load_asset("Heart.png"), width=120)
     st.markdown('<div class="signup-box">', unsafe_allow_html=True)
 
     st.title("🩺 Sign Up")
@@ -129,12 +109,16 @@ def signup_page():
         elif password != confirm:
             st.error("❌ Passwords do not match.")
         else:
-            if load_user(username) is not None:
+            if get_user(username) is not None:
                 st.error(f"❌ Username '{username}' already exists.")
             else:
-                hashed_pw = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
-                insert_user(username, name, hashed_pw)
-                st.success("🎉 Sign up successful! Please switch to the Login tab.")
+                try:
+                    hashed_pw = hash_password(password)
+                except AuthBusy as e:
+                    st.error(f"⏳ {e}")
+                else:
+                    create_user(username, name, hashed_pw)
+                    st.success("🎉 Sign up successful! Please switch to the Login tab.")
 
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -0,0 +1,18 @@
+# tests/conftest.py
+#
+# Run from the repository root:  python -m pytest -q
+# The app modules are imported from the root, against a throwaway database
+# and jobs directory.
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_scratch = tempfile.mkdtemp(prefix='hdd-tests-')
+os.environ['HDD_DB_FILE'] = os.path.join(_scratch, 'submissions.db')
+os.environ['HDD_JOBS_DIR'] = os.path.join(_scratch, 'jobs')
+os.environ.setdefault('HDD_METRICS_PORT', '0')
+os.environ.setdefault('HDD_JOB_WORKER', '0')
@@ -0,0 +1,34 @@
+# tests/test_auth.py
+from auth import LoginThrottle, MAX_FAILURES_PER_USER, login_limits
+
+
+def _lock(throttle, username):
+    for _ in range(MAX_FAILURES_PER_USER):
+        throttle.record_failure(login_limits(username))
+
+
+def test_failures_lock_a_user_out():
+    throttle = LoginThrottle()
+    assert throttle.retry_after(login_limits('alice')) == 0
+    _lock(throttle, 'alice')
+    assert throttle.retry_after(login_limits('alice')) > 0
+    throttle.reset('user:alice')
+    assert throttle.retry_after(login_limits('alice')) == 0
+
+
+def test_locked_user_stays_locked_after_a_flood():
+    throttle = LoginThrottle(max_keys=100)
+    _lock(throttle, 'alice')
+    for i in range(10_000):
+        throttle.record_failure(login_limits(f"flood{i}", f"10.0.{i // 256}.{i % 256}"))
+    assert throttle.retry_after(login_limits('alice')) > 0
+    # The unlocked flood keys are still bounded
+    assert len(throttle._failures) <= 101
+
+
+def test_flood_forgets_unlocked_keys_first():
+    throttle = LoginThrottle(max_keys=10)
+    throttle.record_failure(login_limits('bob'))
+    for i in range(20):
+        throttle.record_failure(login_limits(f"flood{i}"))
+    assert 'user:bob' not in throttle._failures
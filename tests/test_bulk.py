@@ -0,0 +1,32 @@
+# tests/test_bulk.py
+import pandas as pd
+import pytest
+
+from db import get_conn, init_db
+from hdd import run_bulk
+from scoring import REQUIRED_COLS
+
+
+def _count_submissions():
+    return get_conn().execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
+
+
+@pytest.fixture
+def csv_with_bad_line(tmp_path):
+    """30 rows; the last one has a target that isn't 0 or 1 (CSV line 31)."""
+    frame = pd.DataFrame([[52, 1, 2, 165, 220.0, 1, 1, 117, 0, 4.6, 1, 2, 2, 1]] * 30,
+                         columns=REQUIRED_COLS)
+    frame.loc[29, 'target'] = 7
+    path = tmp_path / 'bulk.csv'
+    frame.to_csv(path, index=False)
+    return path
+
+
+def test_a_bad_late_line_saves_nothing(csv_with_bad_line, tmp_path):
+    init_db()
+    before = _count_submissions()
+    out = tmp_path / 'reports.zip'
+    with pytest.raises(ValueError, match='line\\(s\\) 31'):
+        run_bulk(str(csv_with_bad_line), str(out), chunk_rows=10)
+    assert _count_submissions() == before
+    assert not out.exists() and not (tmp_path / 'reports.zip.tmp').exists()
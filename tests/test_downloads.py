@@ -0,0 +1,55 @@
+# tests/test_downloads.py
+import os
+import urllib.error
+import urllib.request
+
+import pytest
+
+import downloads
+
+
+@pytest.fixture
+def server():
+    server = downloads.serve_downloads(0, '127.0.0.1')  # any free port
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_streams_a_published_file(server, tmp_path):
+    path = tmp_path / 'reports.zip'
+    path.write_bytes(os.urandom(3 * downloads.CHUNK_BYTES + 5))
+    token = downloads.publish(str(path), 'bulk reports.zip', 'application/zip')
+    assert downloads.publish(str(path), 'bulk reports.zip', 'application/zip') == token
+
+    with urllib.request.urlopen(f"{server}/{token}") as r:
+        assert r.headers['Content-Type'] == 'application/zip'
+        assert r.headers['Content-Length'] == str(path.stat().st_size)
+        assert "filename*=UTF-8''bulk%20reports.zip" in r.headers['Content-Disposition']
+        assert r.read() == path.read_bytes()
+
+
+def test_unknown_expired_and_missing_files_are_404(server, tmp_path, monkeypatch):
+    with pytest.raises(urllib.error.HTTPError, match='404'):
+        urllib.request.urlopen(f"{server}/not-a-token")
+
+    gone = tmp_path / 'gone.pdf'
+    gone.write_bytes(b'%PDF')
+    token = downloads.publish(str(gone))
+    gone.unlink()
+    with pytest.raises(urllib.error.HTTPError, match='404'):
+        urllib.request.urlopen(f"{server}/{token}")
+
+    backup = tmp_path / 'backup.db'
+    backup.write_bytes(b'SQLite')
+    monkeypatch.setattr(downloads, 'DOWNLOAD_TTL_S', -1)
+    token = downloads.publish(str(backup), delete=True)
+    assert downloads.lookup(token) is None
+    assert not backup.exists()
+
+
+def test_links_use_the_page_host(monkeypatch):
+    monkeypatch.setattr(downloads, 'DOWNLOAD_PORT', 8502)
+    assert downloads.download_url('t', 'example.org:8501') == 'http://example.org:8502/t'
+    assert downloads.download_url('t', '[::1]:8501') == 'http://[::1]:8502/t'
+    monkeypatch.setattr(downloads, 'DOWNLOAD_URL', 'https://example.org/downloads/')
+    assert downloads.download_url('t', 'ignored') == 'https://example.org/downloads/t'
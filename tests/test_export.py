@@ -0,0 +1,39 @@
+# tests/test_export.py
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+
+from db import init_db, save_submissions_bulk
+from export import export_submissions, load_submissions
+from scoring import FEATURE_COLS
+
+
+@pytest.fixture(scope='module')
+def multi_year_rows():
+    """One submission a day for four years: more days than write_dataset's default cap."""
+    init_db()
+    days = [date(2021, 1, 1) + timedelta(days=i) for i in range(4 * 365)]
+    frame = pd.DataFrame({col: 1.0 for col in FEATURE_COLS}, index=range(len(days)))
+    frame.insert(0, 'id', [f"{day:%Y%m%d}_001" for day in days])
+    frame['prediction'] = 0
+    save_submissions_bulk(frame)
+    return len(days)
+
+
+@pytest.mark.parametrize('fmt', ['parquet', 'arrow'])
+def test_export_spanning_years(multi_year_rows, tmp_path, fmt):
+    result = export_submissions(fmt, out_dir=str(tmp_path))
+    assert result['rows'] == multi_year_rows
+    table = load_submissions(fmt, out_dir=str(tmp_path), columns=['id', 'day'])
+    assert table.num_rows == multi_year_rows
+
+
+def test_arrow_loads_are_memory_mapped(multi_year_rows, tmp_path):
+    export_submissions('arrow', out_dir=str(tmp_path))
+    before = pa.total_allocated_bytes()
+    table = load_submissions('arrow', out_dir=str(tmp_path), columns=['age', 'chol'])
+    assert table.num_rows == multi_year_rows
+    assert pa.total_allocated_bytes() - before < table.nbytes
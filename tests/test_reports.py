@@ -0,0 +1,45 @@
+# tests/test_reports.py
+import io
+import re
+import zipfile
+import zlib
+
+from db import init_db
+from jobs import DONE, claim_job, get_job, run_job, submit_bulk_job
+from scoring import REQUIRED_COLS
+
+PATIENT = "52,1,2,165,220,1,1,117,0,4.6,1,2,2,1"
+
+
+def _page_texts(pdf: bytes) -> list:
+    """The decompressed report page content streams in a PDF."""
+    streams = re.findall(rb'stream\r?\n(.*?)\r?\nendstream', pdf, re.S)
+    texts = [zlib.decompress(s) for s in streams if s[:1] == b'x']
+    return [t for t in texts if b'Patient Information' in t]
+
+
+def _normalized(page: bytes) -> bytes:
+    """The page without its date and patient ID, which differ per run."""
+    page = re.sub(rb'\d{4}-\d\d-\d\d \d\d:\d\d:\d\d', b'DATE', page)
+    return re.sub(rb'\d{8}_\d{3,}', b'ID', page)
+
+
+def _run(combined: bool) -> bytes:
+    csv = io.BytesIO(f"{','.join(REQUIRED_COLS)}\n{PATIENT}\n".encode())
+    job_id = submit_bulk_job(csv, 'one.csv', total_rows=1, combined=combined)
+    job = claim_job()
+    assert job['id'] == job_id
+    run_job(job)
+    job = get_job(job_id)
+    assert job['status'] == DONE, job['error']
+    with open(job['output_path'], 'rb') as f:
+        return f.read()
+
+
+def test_combined_pdf_and_zip_print_a_patient_identically():
+    init_db()
+    with zipfile.ZipFile(io.BytesIO(_run(combined=False))) as archive:
+        [name] = archive.namelist()
+        [zip_page] = _page_texts(archive.read(name))
+    [combined_page] = _page_texts(_run(combined=True))
+    assert _normalized(combined_page) == _normalized(zip_page)
@@ -0,0 +1,24 @@
+# tests/test_scoring.py
+
+import pytest
+
+from scoring import FEATURE_COLS, parse_features
+
+
+def test_parse_features_accepts_sequence_and_mapping():
+    values = [63, 1, 3, 145, 233, 1, 0, 150, 0, 2.3, 0, 0, 1]
+    assert parse_features(values) == [float(v) for v in values]
+    assert parse_features(dict(zip(FEATURE_COLS, map(str, values)))) == [float(v) for v in values]
+
+
+@pytest.mark.parametrize('value', ["1111111111111", b"1111111111111", bytearray(b"1" * 13)])
+def test_parse_features_rejects_strings(value):
+    # A 13-character string must not be taken as 13 one-digit features
+    with pytest.raises(ValueError):
+        parse_features(value)
+
+
+@pytest.mark.parametrize('values', [[1] * 12, [1] * 12 + ['x'], [1] * 12 + [float('nan')]])
+def test_parse_features_rejects_bad_values(values):
+    with pytest.raises(ValueError):
+        parse_features(values)
@@ -0,0 +1,105 @@
+# users.py
+#
+# The one place that reads and writes the users table. Rows are kept in a
+# small TTL cache, which every write through this module invalidates, so
+# login/signup/reset don't re-query the same user on each rerun.
+
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from db import get_conn, transaction
+
+CACHE_TTL_S = 60
+CACHE_MAX_USERS = 1024
+
+
+class User(NamedTuple):
+    username: str
+    name: str
+    password_hash: str  # None on the copy kept in the session
+
+
+# ─── 1) TTL cache ─────────────────────────────────────────────────────────────────
+_cache = OrderedDict()  # username -> (expires_at, User or None)
+_cache_lock = threading.Lock()
+
+def invalidate(username: str = None):
+    """Drops one cached user (or all of them)."""
+    with _cache_lock:
+        if username is None:
+            _cache.clear()
+        else:
+            _cache.pop(username, None)
+
+def _cached(username: str):
+    with _cache_lock:
+        entry = _cache.get(username)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry
+
+def _store(username: str, user):
+    with _cache_lock:
+        _cache[username] = (time.monotonic() + CACHE_TTL_S, user)
+        _cache.move_to_end(username)
+        while len(_cache) > CACHE_MAX_USERS:
+            _cache.popitem(last=False)
+
+# ─── 2) Repository ────────────────────────────────────────────────────────────────
+def get_user(username: str) -> User:
+    """Returns the User, or None if there is no such username."""
+    entry = _cached(username)
+    if entry is not None:
+        return entry[1]
+    row = get_conn().execute(
+        "SELECT username, name, password FROM users WHERE username = ?", (username,)
+    ).fetchone()
+    user = User(*row) if row else None
+    _store(username, user)  # "not found" is cached too; create_user() invalidates it
+    return user
+
+def create_user(username: str, name: str, password_hash: str):
+    """Inserts a new user; raises sqlite3.IntegrityError if the username exists."""
+    try:
+        with transaction() as conn:
+            conn.execute(
+                "INSERT INTO users (username, name, password) VALUES (?, ?, ?)",
+                (username, name, password_hash)
+            )
+    finally:
+        invalidate(username)
+
+def update_password(username: str, password_hash: str):
+    try:
+        with transaction() as conn:
+            conn.execute(
+                "UPDATE users SET password = ? WHERE username = ?", (password_hash, username)
+            )
+    finally:
+        invalidate(username)
+
+# ─── 3) Session user ──────────────────────────────────────────────────────────────
+def start_session(user: User):
+    """Marks the Streamlit session as logged in as `user` (without its hash)."""
+    import streamlit as st
+    st.session_state.user = user._replace(password_hash=None)
+    st.session_state.logged_in = True
+    st.session_state.username = user.username
+    st.session_state.full_name = user.name
+
+def session_user() -> User:
+    """
+    The logged-in user of this Streamlit session, or None. The profile is
+    loaded once per session, not per page.
+    """
+    import streamlit as st
+    if not st.session_state.get('logged_in', False):
+        return None
+    user = st.session_state.get('user')
+    if user is None and st.session_state.get('username'):
+        found = get_user(st.session_state.username)
+        if found is not None:
+            user = st.session_state.user = found._replace(password_hash=None)
+    return user